@@ -0,0 +1,57 @@
+# Curated lambda programs for the benchmark suite, in plain lambda calculus
+# so that every backend parses them. Each entry is
+#     name: (program, expected Church numeral, or None when not a numeral)
+# and the combinators below are pasted in as parenthesized text.
+
+TRUE = r"(\x. \y. x)"
+FALSE = r"(\x. \y. y)"
+Y = r"(\f. (\x. f (x x)) \x. f (x x))"
+
+SUCC = r"(\n. \s. \z. s (n s z))"
+PLUS = r"(\m. \n. \s. \z. m s (n s z))"
+MULT = r"(\m. \n. \s. m (n s))"
+POW = r"(\b. \e. e b)"
+PRED = r"(\n. \f. \x. n (\g. \h. h (g f)) (\u. x) (\u. u))"
+MINUS = rf"(\m. \n. n {PRED} m)"
+ISZERO = rf"(\n. n (\x. {FALSE}) {TRUE})"
+LEQ = rf"(\m. \n. {ISZERO} ({MINUS} m n))"
+
+FACTORIAL = rf"({Y} (\f. \x. {ISZERO} x (\s. \z. s z) ({MULT} x (f ({PRED} x)))))"
+DIV = rf"({Y} (\div. \m. \n. {LEQ} n m ({SUCC} (div ({MINUS} m n) n)) (\s. \z. z)))"
+SUM_TO = rf"({Y} (\sum. \n. {ISZERO} n (\s. \z. z) ({PLUS} n (sum ({PRED} n)))))"
+
+# Church lists as right folds
+NIL = r"(\c. \n. n)"
+CONS = r"(\h. \t. \c. \n. c h (t c n))"
+SUM = rf"(\l. l {PLUS} (\s. \z. z))"
+LENGTH = rf"(\l. l (\h. \r. {SUCC} r) (\s. \z. z))"
+FOLDL = r"(\f. \z. \l. l (\h. \g. \x. g (f x h)) (\x. x) z)"
+
+
+def church(n: int) -> str:
+    return r"(\s. \z. " + "s (" * n + "z" + ")" * n + ")"
+
+
+def church_list(values: list[int]) -> str:
+    text = NIL
+    for value in reversed(values):
+        text = f"({CONS} {church(value)} {text})"
+    return text
+
+
+CORPUS = {
+    'add_10': (f"{PLUS} {church(10)} {church(10)}", 20),
+    'add_100': (f"{PLUS} {church(100)} {church(100)}", 200),
+    'add_1000': (f"{PLUS} {church(1000)} {church(1000)}", 2000),
+    'mul_5': (f"{MULT} {church(5)} {church(5)}", 25),
+    'mul_20': (f"{MULT} {church(20)} {church(20)}", 400),
+    'pow_2_8': (f"{POW} {church(2)} {church(8)}", 256),
+    'minus_30_12': (f"{MINUS} {church(30)} {church(12)}", 18),
+    'factorial_3': (f"{FACTORIAL} {church(3)}", 6),
+    'factorial_4': (f"{FACTORIAL} {church(4)}", 24),
+    'div_20_3': (f"{DIV} {church(20)} {church(3)}", 6),
+    'sum_to_10': (f"{SUM_TO} {church(10)}", 55),
+    'list_sum_20': (f"{SUM} {church_list(list(range(20)))}", 190),
+    'list_length_50': (f"{LENGTH} {church_list([1] * 50)}", 50),
+    'list_foldl_20': (f"{FOLDL} {PLUS} {church(0)} {church_list(list(range(20)))}", 190),
+}
@@ -0,0 +1,44 @@
+from src.common.benchmark import benchmark
+from src.lc import instrument
+from src.lc.parser import LambdaParser
+from src.lc import calculi_optimized
+from src.benchmarks.corpus import CORPUS
+
+# Cost of the reduction counters: each corpus program normalized with
+# instrumentation off, on, and on with a hook that does nothing, on every
+# instrumented backend. Off should match the uninstrumented build within
+# noise. Run with `python -m src.benchmarks.instrumentation`.
+
+PROGRAMS = ('add_1000', 'mul_20', 'factorial_3', 'list_sum_20')
+# best of several runs, to keep scheduler noise out of the comparison
+REPEATS = 9
+
+
+def no_op(calculi, event, term):
+    pass
+
+
+def best_time(backend: str, program: str) -> float:
+    # a fresh term for every run, as normalizing flags subterms as normal
+    times = []
+    for _ in range(REPEATS):
+        term = LambdaParser(program, calculi=backend).parse()
+        if backend == 'Optimized':
+            calculi_optimized.clear_cache()
+        times.append(benchmark(term.normalize, measure_time=True)['time_sec'])
+    return min(times)
+
+
+if __name__ == '__main__':
+    for backend in instrument.CALCULI:
+        for name in PROGRAMS:
+            program, _ = CORPUS[name]
+            instrument.disable(backend)
+            off = best_time(backend, program)
+            instrument.enable(calculi=backend)
+            on = best_time(backend, program)
+            instrument.enable(hooks=(no_op,), calculi=backend)
+            hooked = best_time(backend, program)
+            instrument.disable(backend)
+            print(f"{backend:<10} {name:<14} off {off * 1000:>9.2f} ms   on {on / off:>5.2f}x   "
+                  f"on with hook {hooked / off:>5.2f}x")
@@ -0,0 +1,83 @@
+import sys
+import json
+import time
+import asyncio
+from collections import Counter
+
+from src.benchmarks.corpus import CORPUS
+
+# Load generator for src.lc_macro.server: CONNECTIONS concurrent clients
+# send REQUESTS expressions in total, by default the programs of the corpus
+# in turn, each client keeping up to PIPELINE requests in flight. Reports
+# throughput, latency percentiles as seen by the clients, and statuses. Run
+# with
+#     python -m src.benchmarks.load (--socket=/tmp/lc.sock | --port=8765) [--host=127.0.0.1]
+#         [--connections=8] [--requests=200] [--pipeline=1] [--expr="+ 1 2"] [--timeout=10]
+
+CONNECTIONS = 8
+REQUESTS = 200
+PIPELINE = 1
+
+
+async def client(address: dict, expressions: list[str], pipeline: int, limits: dict,
+                 latencies: list[float], statuses: Counter):
+    if 'path' in address:
+        reader, writer = await asyncio.open_unix_connection(address['path'])
+    else:
+        reader, writer = await asyncio.open_connection(address['host'], address['port'])
+    sent = {}
+    pending = iter(enumerate(expressions))
+
+    def send() -> bool:
+        for i, expr in pending:
+            sent[i] = time.perf_counter()
+            writer.write(json.dumps({'id': i, 'expr': expr, **limits}).encode() + b'\n')
+            return True
+        return False
+
+    for _ in range(pipeline):
+        send()
+    while sent:
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent.pop(response['id']))
+        statuses['error' if 'error' in response else response['status']] += 1
+        send()
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(address: dict, expressions: list[str], connections: int, pipeline: int, limits: dict) -> dict:
+    latencies = []
+    statuses = Counter()
+    # request i goes to connection i % connections
+    shares = [expressions[i::connections] for i in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(address, share, pipeline, limits, latencies, statuses) for share in shares if share))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'time_sec': elapsed,
+        'requests_per_sec': len(latencies) / elapsed,
+        'latency_ms': {
+            f'p{p}': latencies[min(len(latencies) * p // 100, len(latencies) - 1)] * 1000 for p in (50, 90, 99)
+        } | {'max': latencies[-1] * 1000},
+        'statuses': dict(statuses),
+    }
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: x.lstrip('-').split('=', 1), sys.argv[1:]))
+    if 'socket' in variables:
+        address = {'path': variables['socket']}
+    else:
+        address = {'host': variables.get('host', '127.0.0.1'), 'port': int(variables['port'])}
+    programs = [variables['expr']] if 'expr' in variables else [program for program, _ in CORPUS.values()]
+    n_requests = int(variables.get('requests', REQUESTS))
+    expressions = [programs[i % len(programs)] for i in range(n_requests)]
+    limits = {'timeout': float(variables['timeout'])} if 'timeout' in variables else {}
+
+    report = asyncio.run(run(address, expressions, int(variables.get('connections', CONNECTIONS)),
+                             int(variables.get('pipeline', PIPELINE)), limits))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,44 @@
+import sys
+
+from src.common.benchmark import benchmark
+from src.lc.parser import LambdaParser
+
+# Parse throughput of LambdaParser for every backend, on generated programs
+# of a few hundred kilobytes, and whether it survives terms nested deeper
+# than the recursion limit. Run with `python -m src.benchmarks.parsing`.
+
+BACKENDS = ['Vanilla', 'Lazy', 'Optimized', 'DeBruijn', 'Machine', 'NbE']
+
+WIDE_SIZE = 5000
+DEEP_SIZE = 5000
+# best of several runs, to keep scheduler noise out of the comparison
+REPEATS = 5
+
+
+def wide(size: int) -> str:
+    # a long application of small abstractions, like an expanded program line
+    return "\\f. \\x. f " + " ".join(f"(\\y. f (y x) \\z. z y)" for _ in range(size))
+
+
+def deep(size: int) -> str:
+    # a Church numeral as printed by repr, one parenthesis per successor
+    return "(\\s. (\\z. " + "(s " * size + "z" + ")" * size + "))"
+
+
+def run(name: str, workload: str, text: str, repeats: int):
+    try:
+        time_sec = min(
+            benchmark(lambda: LambdaParser(text, calculi=name).parse(), measure_time=True)['time_sec']
+            for _ in range(repeats)
+        )
+        print(f"{name:<10} {workload:<10} {len(text) / time_sec / 1e6:>12.2f} MB/sec")
+    except RecursionError:
+        print(f"{name:<10} {workload:<10} {'RecursionError':>12}")
+
+
+if __name__ == '__main__':
+    backends = sys.argv[1:] or BACKENDS
+    for backend in backends:
+        run(backend, 'wide', wide(WIDE_SIZE), REPEATS)
+    for backend in backends:
+        run(backend, 'deep', deep(DEEP_SIZE), 1)
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import importlib
+import subprocess
+
+from src.common.benchmark import benchmark
+from src.lc_macro.preprocessors import Preprocessor, NumberPreprocessor
+
+# Startup time and throughput of numeral expansion: the current
+# NumberPreprocessor against the former pandas/CSV one, on generated .lc
+# files with many numerals. Run with `python -m src.benchmarks.preprocessing`.
+
+RNG = 100
+LINES = (100, 1000, 5000)
+# best of several runs, to keep scheduler noise out of the comparison
+REPEATS = 5
+
+
+class LegacyNumberPreprocessor(Preprocessor):
+    # the implementation replaced in user-008, kept as the baseline
+    def __init__(self, rng: int, directory: str):
+        import pandas as pd
+
+        numbers_file_name = f'{directory}/number_{rng}.csv'
+        if os.path.exists(numbers_file_name):
+            self.numbers_df = pd.read_csv(numbers_file_name)
+        else:
+            numerals = NumberPreprocessor(rng)
+            numbers = [[i, numerals.get_numeral(i)] for i in range(rng)]
+            self.numbers_df = pd.DataFrame(numbers, columns=['n', 'numeral'])
+            os.makedirs(directory, exist_ok=True)
+            self.numbers_df.to_csv(numbers_file_name, index=False)
+
+    def perform(self, text: str) -> str:
+        import re
+
+        matches = [(m.group(), m.start(), m.end()) for m in re.finditer("[0-9]+", text)]
+        offset = 0
+        for match, start, end in matches:
+            intron = self.numbers_df[self.numbers_df['n'] == int(match)].iloc[0]['numeral']
+            text = text[:start + offset] + intron + text[end + offset:]
+            offset += len(intron) - len(match)
+        return text
+
+
+def program(n_lines: int) -> str:
+    # a line of the shape met in program.lc, with a handful of numerals each
+    return ''.join(f"+ {i % RNG} (* {(i * 7) % RNG} (- {(i * 13) % RNG} 1));\n" for i in range(n_lines))
+
+
+def startup(statement: str) -> float:
+    # a fresh interpreter, so that module imports are paid again
+    code = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+def run_startup(directory: str, legacy: bool):
+    current = startup(f"from src.lc_macro.preprocessors import NumberPreprocessor; NumberPreprocessor({RNG})")
+    print(f"{'current':<10} {'startup':<10} {current * 1000:>12.1f} ms")
+    if not legacy:
+        return
+    legacy = startup(
+        f"from src.benchmarks.preprocessing import LegacyNumberPreprocessor; "
+        f"LegacyNumberPreprocessor({RNG}, {directory!r})"
+    )
+    print(f"{'legacy':<10} {'startup':<10} {legacy * 1000:>12.1f} ms")
+
+
+def run_throughput(name: str, make, n_lines: int):
+    text = program(n_lines)
+    time_sec = min(
+        benchmark(lambda: make().perform(text), measure_time=True)['time_sec'] for _ in range(REPEATS)
+    )
+    print(f"{name:<10} {'perform':<10} lines={n_lines:<6} {len(text) / time_sec / 1e6:>12.2f} MB/sec")
+
+
+if __name__ == '__main__':
+    try:
+        importlib.import_module('pandas')
+        has_pandas = True
+    except ImportError:
+        has_pandas = False
+        print("pandas is not installed, the legacy baseline is skipped")
+
+    with tempfile.TemporaryDirectory() as directory:
+        run_startup(directory, has_pandas)
+
+        for n_lines in LINES:
+            run_throughput('current', lambda: NumberPreprocessor(RNG), n_lines)
+            if has_pandas:
+                legacy = LegacyNumberPreprocessor(RNG, directory)
+                run_throughput('legacy', lambda: legacy, n_lines)
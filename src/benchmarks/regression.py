@@ -0,0 +1,125 @@
+import gc
+import sys
+import json
+import platform
+
+from src.common.benchmark import benchmark
+from src.lc.parser import LambdaParser
+from src.lc import calculi_optimized
+from src.lc.decode import numeral
+from src.benchmarks.corpus import CORPUS
+
+# Runs the corpus on every backend and records, per program, the wall time,
+# reduction steps, steps/sec and peak tracemalloc memory into JSON. Given a
+# baseline written by an earlier run, it flags the programs that got slower
+# or hungrier by more than THRESHOLD, or whose steps or results changed, and
+# exits with status 1. Run with
+#     python -m src.benchmarks.regression [--output=new.json] [--baseline=old.json]
+#         [--threshold=0.25] [--backends=Vanilla,Lazy]
+
+BACKENDS = ['Vanilla', 'Lazy', 'Optimized']
+
+# best of several runs, each repeating the program for at least MIN_RUN_SEC,
+# to keep scheduler and collector noise out of the comparison
+REPEATS = 7
+MIN_RUN_SEC = 0.05
+# relative change in time or memory reported as a regression
+THRESHOLD = 0.25
+
+
+def measure(backend: str, program: str) -> dict:
+    term = LambdaParser(program, calculi=backend).parse()
+
+    def normalize():
+        if backend == 'Optimized':
+            # every run starts from an empty hash-consing table
+            calculi_optimized.clear_cache()
+        return term.normalize()
+
+    n_iter = 1
+    while True:
+        time_sec = benchmark(normalize, measure_time=True, n_iter=n_iter)['time_sec']
+        if time_sec * n_iter >= MIN_RUN_SEC:
+            break
+        n_iter = min(n_iter * 10, int(MIN_RUN_SEC / max(time_sec, 1e-6)) + 1)
+    for _ in range(REPEATS - 1):
+        gc.collect()
+        time_sec = min(time_sec, benchmark(normalize, measure_time=True, n_iter=n_iter)['time_sec'])
+    stats = benchmark(normalize, measure_tracemalloc=True)
+    normal_form, steps = stats['result']
+    return {
+        'time_sec': time_sec,
+        'steps': steps,
+        'steps_per_sec': steps / time_sec if time_sec else None,
+        'peak_bytes': stats['tracemalloc_peak_bytes'],
+        'result': numeral(normal_form),
+    }
+
+
+def run(backends: list[str]) -> dict:
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for name, (program, expected) in CORPUS.items():
+            try:
+                record = measure(backend, program)
+                record['ok'] = record['result'] == expected
+            except RecursionError:
+                record = {'error': 'RecursionError', 'ok': False}
+            results[backend][name] = record
+            print(format_record(backend, name, record))
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def format_record(backend: str, name: str, record: dict) -> str:
+    if 'error' in record:
+        return f"{backend:<10} {name:<16} {record['error']}"
+    flag = '' if record['ok'] else '  WRONG RESULT'
+    return (f"{backend:<10} {name:<16} {record['time_sec'] * 1000:>10.2f} ms {record['steps']:>8} steps "
+            f"{record['steps_per_sec'] or 0:>12.0f} steps/sec {record['peak_bytes'] / 1024:>10.1f} KiB{flag}")
+
+
+def compare(report: dict, baseline: dict, threshold: float = THRESHOLD) -> list[str]:
+    regressions = []
+    for backend, records in report['results'].items():
+        for name, record in records.items():
+            old = baseline['results'].get(backend, {}).get(name)
+            if old is None:
+                continue
+            if 'error' in record or 'error' in old:
+                if record.get('error') != old.get('error'):
+                    regressions.append(f"{backend} {name}: {old.get('error', 'ok')} -> {record.get('error', 'ok')}")
+                continue
+            if record['ok'] != old['ok'] or record['result'] != old['result']:
+                regressions.append(f"{backend} {name}: result {old['result']} -> {record['result']}")
+            if record['steps'] != old['steps']:
+                regressions.append(f"{backend} {name}: steps {old['steps']} -> {record['steps']}")
+            for key in ('time_sec', 'peak_bytes'):
+                if old[key] and record[key] > old[key] * (1 + threshold):
+                    regressions.append(f"{backend} {name}: {key} {old[key]:.6g} -> {record[key]:.6g} "
+                                       f"(+{(record[key] / old[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: x.lstrip('-').split('=', 1), sys.argv[1:]))
+    backends = variables['backends'].split(',') if 'backends' in variables else BACKENDS
+
+    report = run(backends)
+    if 'output' in variables:
+        with open(variables['output'], "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if 'baseline' in variables:
+        with open(variables['baseline'], "r", encoding="utf-8") as baseline_file:
+            threshold = float(variables.get('threshold', THRESHOLD))
+            regressions = compare(report, json.load(baseline_file), threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
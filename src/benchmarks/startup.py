@@ -0,0 +1,101 @@
+import sys
+import json
+import subprocess
+
+# Startup latency: the time to import each entry point in a fresh
+# interpreter, as reported by `python -X importtime`, and which calculi and
+# heavy modules it drags in. Given a baseline written by an earlier run, it
+# flags the entry points that got slower by more than THRESHOLD and exits
+# with status 1. Run with
+#     python -m src.benchmarks.startup [--output=new.json] [--baseline=old.json]
+#         [--threshold=0.25] [--top=5]
+
+ENTRY_POINTS = [
+    'src.lc.parser',
+    'src.lc.cli',
+    'src.lc.evaluate',
+    'src.lc.pool',
+    'src.lc_macro.parser',
+    'src.lc_macro.server',
+    'src.lc.calculi_vanilla',
+    'src.lc.calculi_optimized',
+    'src.lc.calculi_lazy',
+    'src.lc.calculi_debruijn',
+    'src.lc.calculi_machine',
+    'src.lc.calculi_nbe',
+]
+
+# best of several fresh interpreters, to keep disk cache and scheduler noise
+# out of the comparison
+REPEATS = 5
+THRESHOLD = 0.25
+TOP = 5
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """module: (self, cumulative) import time in microseconds, for every
+    module first imported by `import module`."""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_us), int(cumulative_us)
+    return times
+
+
+def measure(module: str, top: int = TOP) -> dict:
+    runs = [import_times(module) for _ in range(REPEATS)]
+    best = min(runs, key=lambda times: times[module][1])
+    heaviest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        'time_ms': best[module][1] / 1000,
+        'modules': len(best),
+        'calculi': sorted(name.rsplit('.', 1)[1] for name in best if name.startswith('src.lc.calculi_')),
+        'heaviest': {name: self_us / 1000 for name, (self_us, _) in heaviest},
+    }
+
+
+def run(top: int = TOP) -> dict:
+    results = {}
+    for module in ENTRY_POINTS:
+        record = measure(module, top)
+        results[module] = record
+        print(f"{module:<26} {record['time_ms']:>8.2f} ms {record['modules']:>5} modules  "
+              f"calculi: {', '.join(record['calculi']) or '-'}")
+    return {'python': sys.version.split()[0], 'results': results}
+
+
+def compare(report: dict, baseline: dict, threshold: float = THRESHOLD) -> list[str]:
+    regressions = []
+    for module, record in report['results'].items():
+        old = baseline['results'].get(module)
+        if old is None:
+            continue
+        if record['time_ms'] > old['time_ms'] * (1 + threshold):
+            regressions.append(f"{module}: time_ms {old['time_ms']:.2f} -> {record['time_ms']:.2f} "
+                               f"(+{(record['time_ms'] / old['time_ms'] - 1) * 100:.0f}%)")
+        if set(record['calculi']) - set(old['calculi']):
+            regressions.append(f"{module}: now imports {', '.join(sorted(set(record['calculi']) - set(old['calculi'])))}")
+    return regressions
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: x.lstrip('-').split('=', 1), sys.argv[1:]))
+
+    report = run(int(variables.get('top', TOP)))
+    if 'output' in variables:
+        with open(variables['output'], "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if 'baseline' in variables:
+        with open(variables['baseline'], "r", encoding="utf-8") as baseline_file:
+            threshold = float(variables.get('threshold', THRESHOLD))
+            regressions = compare(report, json.load(baseline_file), threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,67 @@
+import sys
+
+from src.common.benchmark import benchmark
+from src.lc import calculi_vanilla, calculi_lazy, calculi_optimized
+
+# Throughput of the term traversals (normalize, subst, ==, str, repr) on
+# shallow terms, and whether they survive terms deeper than the recursion
+# limit. Run with `python -m src.benchmarks.traversal`.
+
+BACKENDS = {
+    'Vanilla': (calculi_vanilla.Var, calculi_vanilla.App, calculi_vanilla.Abs),
+    'Lazy': (calculi_lazy.Var, calculi_lazy.App, calculi_lazy.Abs),
+    'Optimized': (calculi_optimized.VarFact, calculi_optimized.AppFact, calculi_optimized.AbsFact),
+}
+
+SHALLOW_ITERATIONS = 2000
+DEEP_SIZE = 5000
+# best of several runs, to keep scheduler noise out of the comparison
+REPEATS = 5
+
+
+def church(n: int, Var, App, Abs):
+    body = Var('z')
+    for _ in range(n):
+        body = App(Var('s'), body)
+    return Abs('s', Abs('z', body))
+
+
+def plus(Var, App, Abs):
+    # \x.\y.\s.\z. x s (y s z)
+    return Abs('x', Abs('y', Abs('s', Abs('z', App(
+        App(Var('x'), Var('s')),
+        App(App(Var('y'), Var('s')), Var('z'))
+    )))))
+
+
+def workloads(Var, App, Abs, size: int) -> dict:
+    numeral = church(size, Var, App, Abs)
+    other = church(size, Var, App, Abs)
+    body = numeral.body.body
+    # the Cython backends take names as bytes
+    var = 's' if isinstance(Var('s').name, str) else b's'
+    return {
+        'normalize': lambda: App(App(plus(Var, App, Abs), church(size, Var, App, Abs)), church(2, Var, App, Abs)).normalize(),
+        'subst': lambda: body.subst(var, Var('f')),
+        'eq': lambda: numeral == other,
+        'str': lambda: str(numeral),
+        'repr': lambda: repr(numeral),
+    }
+
+
+def run(name: str, size: int, n_iter: int, repeats: int = 1):
+    Var, App, Abs = BACKENDS[name]
+    for op, func in workloads(Var, App, Abs, size).items():
+        try:
+            time_sec = min(benchmark(func, measure_time=True, n_iter=n_iter)['time_sec'] for _ in range(repeats))
+            print(f"{name:<10} {op:<10} size={size:<6} {1 / time_sec:>12.1f} ops/sec")
+        except RecursionError:
+            print(f"{name:<10} {op:<10} size={size:<6} {'RecursionError':>12}")
+
+
+if __name__ == '__main__':
+    backends = sys.argv[1:] or list(BACKENDS)
+    for backend in backends:
+        run(backend, 3, SHALLOW_ITERATIONS, REPEATS)
+    for backend in backends:
+        run(backend, DEEP_SIZE, 1)
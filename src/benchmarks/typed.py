@@ -0,0 +1,79 @@
+import gc
+import sys
+import json
+import time
+
+from src.lc.parser import LambdaParser
+from src.lc.evaluate import evaluate
+from src.lc.decode import numeral
+from src.lc.typecheck import infer
+from src.lc import calculi_optimized
+from src.benchmarks.corpus import CORPUS
+
+# The fast path of simply typed terms (see src/lc/evaluate.py): every
+# program of the corpus, built from the definitions of the prelude, is
+# evaluated once guarded like any other term, stepped one at a time and
+# hashed for cycles, and once letting the evaluation look for a simple type
+# at its first check and hand a typed term over to the calculi's own loop.
+# A program with no simple type, like those using Y, may still reach a typed
+# term on the way. Reports the type of the program, and the steps and time
+# both ways. Run with
+#     python -m src.benchmarks.typed [--output=typed.json] [--backends=Vanilla,Lazy]
+#         [--fuel=100000]
+
+BACKENDS = ['Vanilla', 'Lazy', 'Optimized']
+
+# best of several runs, each on a freshly parsed term, as Lazy keeps what it
+# learns about a term in the term
+REPEATS = 5
+
+
+def measure(backend: str, program: str, typecheck: bool, fuel: int = None) -> tuple[float, int, str, object]:
+    best = None
+    for _ in range(REPEATS):
+        if backend == 'Optimized':
+            calculi_optimized.clear_cache()
+        term = LambdaParser(program, calculi=backend).parse()
+        gc.collect()
+        start = time.perf_counter()
+        evaluation = evaluate(term, fuel=fuel, typecheck=typecheck)
+        time_sec = time.perf_counter() - start
+        best = time_sec if best is None else min(best, time_sec)
+    return best, evaluation.steps, evaluation.status, numeral(evaluation.term)
+
+
+def run(backends: list[str], fuel: int = None) -> dict:
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for name, (program, expected) in CORPUS.items():
+            type_ = infer(LambdaParser(program, calculi=backend).parse())
+            try:
+                guarded = measure(backend, program, False, fuel)
+                typed = measure(backend, program, True, fuel)
+            except RecursionError:
+                results[backend][name] = {'error': 'RecursionError'}
+                print(f"{backend:<10} {name:<16} RecursionError")
+                continue
+            record = results[backend][name] = {
+                'type': type_,
+                'guarded': {'time_sec': guarded[0], 'steps': guarded[1], 'status': guarded[2]},
+                'typed': {'time_sec': typed[0], 'steps': typed[1], 'status': typed[2]},
+                'speedup': guarded[0] / typed[0] if typed[0] else None,
+                'ok': guarded[3] == typed[3] == expected,
+            }
+            flag = '' if record['ok'] else '  WRONG RESULT'
+            print(f"{backend:<10} {name:<16} {'typed' if type_ else 'untyped':<8} "
+                  f"{guarded[0] * 1000:>10.2f} ms {guarded[1]:>8} steps {typed[0] * 1000:>10.2f} ms "
+                  f"{typed[1]:>8} steps {record['speedup'] or 0:>6.2f}x{flag}")
+    return {'fuel': fuel, 'results': results}
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: x.lstrip('-').split('=', 1), sys.argv[1:]))
+    backends = variables['backends'].split(',') if 'backends' in variables else BACKENDS
+
+    report = run(backends, int(variables['fuel']) if 'fuel' in variables else None)
+    if 'output' in variables:
+        with open(variables['output'], "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
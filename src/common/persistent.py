@@ -0,0 +1,190 @@
+from typing import Any, Hashable, Iterator, Optional
+
+# An immutable hash map: set() and delete() return a new map sharing all
+# but the path to the changed key with the old one, so keeping every
+# version costs O(log n) per update instead of a copy of the whole map.
+#
+# A hash array mapped trie: each level of a branch consumes BITS bits of
+# the key's hash, a bitmap telling which of its 2**BITS slots are taken and
+# the taken ones being packed in a tuple. Keys whose whole hashes are equal
+# share a collision bucket.
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_MASK = (1 << 64) - 1
+
+
+class Leaf:
+    __slots__ = ('hash', 'key', 'value')
+
+    def __init__(self, hash: int, key: Hashable, value: Any):
+        self.hash = hash
+        self.key = key
+        self.value = value
+
+
+class Collision:
+    __slots__ = ('hash', 'leaves')
+
+    def __init__(self, hash: int, leaves: tuple):
+        self.hash = hash
+        self.leaves = leaves
+
+
+class Branch:
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap: int, children: tuple):
+        self.bitmap = bitmap
+        self.children = children
+
+
+EMPTY_BRANCH = Branch(0, ())
+
+
+def merge(shift: int, left, right) -> Branch:
+    # a branch holding two nodes of different hashes, at the first level
+    # where their hashes part
+    left_slot = (left.hash >> shift) & MASK
+    right_slot = (right.hash >> shift) & MASK
+    if left_slot == right_slot:
+        return Branch(1 << left_slot, (merge(shift + BITS, left, right),))
+    if left_slot < right_slot:
+        return Branch((1 << left_slot) | (1 << right_slot), (left, right))
+    return Branch((1 << left_slot) | (1 << right_slot), (right, left))
+
+
+def insert(node, shift: int, leaf: Leaf) -> tuple[Any, bool]:
+    """The node with `leaf` in, and whether its key is new."""
+    kind = type(node)
+    if kind is Branch:
+        bit = 1 << ((leaf.hash >> shift) & MASK)
+        index = (node.bitmap & (bit - 1)).bit_count()
+        children = node.children
+        if not node.bitmap & bit:
+            return Branch(node.bitmap | bit, children[:index] + (leaf,) + children[index:]), True
+        child, added = insert(children[index], shift + BITS, leaf)
+        return Branch(node.bitmap, children[:index] + (child,) + children[index + 1:]), added
+    if kind is Leaf:
+        if node.hash != leaf.hash:
+            return merge(shift, node, leaf), True
+        if node.key == leaf.key:
+            return leaf, False
+        return Collision(leaf.hash, (node, leaf)), True
+    if node.hash != leaf.hash:
+        return merge(shift, node, leaf), True
+    for i, other in enumerate(node.leaves):
+        if other.key == leaf.key:
+            return Collision(node.hash, node.leaves[:i] + (leaf,) + node.leaves[i + 1:]), False
+    return Collision(node.hash, node.leaves + (leaf,)), True
+
+
+def remove(node, shift: int, hash: int, key: Hashable) -> tuple[Optional[Any], bool]:
+    """The node without `key`, None when nothing is left, and whether the
+    key was there."""
+    kind = type(node)
+    if kind is Branch:
+        bit = 1 << ((hash >> shift) & MASK)
+        if not node.bitmap & bit:
+            return node, False
+        index = (node.bitmap & (bit - 1)).bit_count()
+        child, removed = remove(node.children[index], shift + BITS, hash, key)
+        if not removed:
+            return node, False
+        if child is not None:
+            children = node.children[:index] + (child,) + node.children[index + 1:]
+            return Branch(node.bitmap, children), True
+        if node.bitmap == bit:
+            return None, True
+        children = node.children[:index] + node.children[index + 1:]
+        if len(children) == 1 and type(children[0]) is not Branch:
+            # a lone leaf moves up, where its hash alone places it
+            return children[0], True
+        return Branch(node.bitmap & ~bit, children), True
+    if kind is Leaf:
+        if node.hash == hash and node.key == key:
+            return None, True
+        return node, False
+    if node.hash != hash:
+        return node, False
+    leaves = tuple(leaf for leaf in node.leaves if leaf.key != key)
+    if len(leaves) == len(node.leaves):
+        return node, False
+    return (leaves[0] if len(leaves) == 1 else Collision(hash, leaves)), True
+
+
+class PersistentMap:
+    __slots__ = ('root', 'size')
+
+    def __init__(self, root=EMPTY_BRANCH, size: int = 0):
+        self.root = root
+        self.size = size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        hash_ = hash(key) & HASH_MASK
+        node = self.root
+        shift = 0
+        while True:
+            kind = type(node)
+            if kind is Branch:
+                bit = 1 << ((hash_ >> shift) & MASK)
+                if not node.bitmap & bit:
+                    return default
+                node = node.children[(node.bitmap & (bit - 1)).bit_count()]
+                shift += BITS
+            elif kind is Leaf:
+                return node.value if node.hash == hash_ and node.key == key else default
+            else:
+                if node.hash == hash_:
+                    for leaf in node.leaves:
+                        if leaf.key == key:
+                            return leaf.value
+                return default
+
+    def set(self, key: Hashable, value: Any) -> 'PersistentMap':
+        root, added = insert(self.root, 0, Leaf(hash(key) & HASH_MASK, key, value))
+        return PersistentMap(root, self.size + added)
+
+    def delete(self, key: Hashable) -> 'PersistentMap':
+        root, removed = remove(self.root, 0, hash(key) & HASH_MASK, key)
+        if not removed:
+            return self
+        if root is None:
+            root = EMPTY_BRANCH
+        elif type(root) is not Branch:
+            # the root stays a branch, so that every lookup starts the same way
+            root = Branch(1 << (root.hash & MASK), (root,))
+        return PersistentMap(root, self.size - 1)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __len__(self) -> int:
+        return self.size
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            kind = type(node)
+            if kind is Branch:
+                stack.extend(node.children)
+            elif kind is Leaf:
+                yield node.key, node.value
+            else:
+                for leaf in node.leaves:
+                    yield leaf.key, leaf.value
+
+    def __iter__(self) -> Iterator[Hashable]:
+        for key, _ in self.items():
+            yield key
+
+
+MISSING = object()
+EMPTY = PersistentMap()
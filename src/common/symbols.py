@@ -0,0 +1,95 @@
+# The symbol table of variable names, shared by all the calculi in a process.
+# A name gets a small integer id, its symbol, the first time it is interned,
+# and keeps it for good. The Cython calculi store symbols in their terms in
+# place of strings, and compare, hash and find free variables by them.
+#
+# The Python calculi keep names as strings, and free variables as frozensets
+# that are shared wherever they can be: every variable of a name gets the
+# same singleton, and a term whose free variables are those of one of its
+# subterms reuses that subterm's set, so most terms add no set of their own.
+#
+# Building a term still costs time in its free variables: a Python union
+# takes one subset test, in the size of the smaller set, and a Cython
+# application merges the sorted free variables of both sides.
+#
+# Alpha-renaming does not make up names of its own, which would each stay in
+# the table for good: it takes the first of _a, _b, ... free neither in the
+# body it renames nor in the value substituted into it, so the table only
+# grows with the number of free variables a term has, not with the renames
+# done over the life of the process.
+
+import string
+
+from .utils import get_nth_lex_string
+
+NO_FREE_VARS = frozenset()
+
+_symbols: dict[str, int] = {}
+_names: list[str] = []
+_singletons: dict[str, frozenset] = {}
+# the names renaming picks from, in order
+_renamed: list[str] = []
+
+
+def intern(name: str) -> int:
+    symbol = _symbols.get(name)
+    if symbol is None:
+        symbol = _symbols[name] = len(_names)
+        _names.append(name)
+    return symbol
+
+
+def name(symbol: int) -> str:
+    return _names[symbol]
+
+
+def size() -> int:
+    return len(_names)
+
+
+def singleton(name: str) -> frozenset:
+    """The free variables of a variable named `name`."""
+    free_vars = _singletons.get(name)
+    if free_vars is None:
+        intern(name)
+        free_vars = _singletons[name] = frozenset((name,))
+    return free_vars
+
+
+def renamed(n: int) -> str:
+    """The `n`-th of the names alpha-renaming picks from."""
+    while len(_renamed) <= n:
+        _renamed.append('_' + get_nth_lex_string(len(_renamed) + 1, string.ascii_lowercase))
+    return _renamed[n]
+
+
+def fresh(body: frozenset, value: frozenset) -> str:
+    """The first name for renaming in neither `body` nor `value`."""
+    n = 0
+    while renamed(n) in body or renamed(n) in value:
+        n += 1
+    return renamed(n)
+
+
+def union(left: frozenset, right: frozenset) -> frozenset:
+    """left | right, being one of them when it holds the other."""
+    if left is right or not right:
+        return left
+    if not left:
+        return right
+    # only the smaller set can be held by the other
+    if len(right) <= len(left):
+        if right <= left:
+            return left
+    elif left <= right:
+        return right
+    return left | right
+
+
+def without(free_vars: frozenset, name: str) -> frozenset:
+    """free_vars - {name}, being free_vars when name is not in it."""
+    if name not in free_vars:
+        return free_vars
+    if len(free_vars) == 1:
+        return NO_FREE_VARS
+    return free_vars - {name}
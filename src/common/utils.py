@@ -22,7 +22,7 @@ def get_nth_lex_string(n: int, alphabet: str = string.ascii_lowercase + '_') ->
 
     for i in range(L - 1, -1, -1):
         idx, r = divmod(idx, k)
-        res[i] = alphabet[r]
+        res[i] = ord(alphabet[r])
     return res.decode()
 
 
@@ -0,0 +1,178 @@
+from typing import Any, Union
+
+# Alpha-invariant Merkle hashing of named terms.
+#
+# Every term has a `shape`, a hash of its structure that does not depend on
+# any name, and its free variables, each mapped to a coefficient that
+# depends on where the variable occurs. Its hash is
+#     shape + sum(coefficient * H(name) for each free variable)   (mod P)
+# An abstraction over x takes x's term out of the sum and adds a marker in
+# its place to the shape, so the hash of a term does not depend on the names
+# of its parameters, while free variables still count by name. Both
+# multipliers of an application are drawn from the shape of the other side,
+# which keeps the order of the steps down to an occurrence from cancelling
+# out, as it would with fixed multipliers.
+#
+# Alpha-equivalent terms then hash alike, so a differing hash settles most
+# comparisons at once. Equal hashes are confirmed by alpha_equal, where the
+# shapes of subterms, equal for subterms that match, cut the walk short.
+#
+# The Cython calculi compute all of this as terms are built, in C, and keep
+# the coefficients as their `free_vars`. The Python calculi would pay more
+# for it than for the rest of building a term, so theirs is computed by
+# summary() the first time a term is hashed, and kept on every node it
+# visits; comparing terms that were never hashed walks them as before, for
+# reduction compares many terms it never sees again. P is small enough for
+# products to fit in 64 bits.
+
+# (shape, hash, free variables), a term's part in the hash of its ancestors
+Summary = tuple[int, int, dict[str, int]]
+
+P = (1 << 31) - 1
+K_APP = 0x2545F491
+K_ABS = 0x4F6CDD1D
+K_LIT = 0x1B873593
+BOUND = 0x5BD1E995
+ABS_SHAPE = 0x27D4EB2F
+ABS_COEFFICIENT = 0x165667B1
+MIX = 0x3C6EF372
+FUNC_SALT = 0x6A09E667
+ARG_SALT = 0x3C6EF35F
+
+
+def name_hash(name: str) -> int:
+    return hash(name) % P
+
+
+def mix(shape: int, salt: int) -> int:
+    # a multiplier drawn from a shape, never 0
+    return ((shape ^ salt) * MIX + 1) % P or 1
+
+
+def var_summary(name: str) -> Summary:
+    return 0, name_hash(name), {name: 1}
+
+
+def lit_summary(value: Any) -> Summary:
+    shape = (K_LIT + hash((type(value).__name__, value))) % P
+    return shape, shape, {}
+
+
+def app_summary(func: Summary, arg: Summary) -> Summary:
+    func_shape, func_hash, func_free_vars = func
+    arg_shape, arg_hash, arg_free_vars = arg
+    func_factor = mix(arg_shape, FUNC_SALT)
+    arg_factor = mix(func_shape, ARG_SALT)
+    shape = (K_APP + func_factor * func_shape + arg_factor * arg_shape) % P
+    hash_ = (K_APP + func_factor * func_hash + arg_factor * arg_hash) % P
+    free_vars = {name: func_factor * coefficient % P for name, coefficient in func_free_vars.items()}
+    for name, coefficient in arg_free_vars.items():
+        free_vars[name] = (free_vars.get(name, 0) + arg_factor * coefficient) % P
+    return shape, hash_, free_vars
+
+
+def abs_summary(param: str, body: Summary) -> Summary:
+    body_shape, body_hash, body_free_vars = body
+    if param in body_free_vars:
+        coefficient = body_free_vars[param]
+        bound_part = coefficient * name_hash(param)
+        free_vars = {name: ABS_COEFFICIENT * c % P for name, c in body_free_vars.items() if name != param}
+    else:
+        coefficient = bound_part = 0
+        free_vars = {name: ABS_COEFFICIENT * c % P for name, c in body_free_vars.items()}
+    shape = (K_ABS + ABS_SHAPE * (body_shape + coefficient * BOUND)) % P
+    hash_ = (shape + ABS_COEFFICIENT * ((body_hash - body_shape - bound_part) % P)) % P
+    return shape, hash_, free_vars
+
+
+def summary(term) -> Summary:
+    """(shape, hash, free_vars) of `term`, computed bottom-up on first use and
+    kept in the `_summary` of every node on the way."""
+    if term._summary is not None:
+        return term._summary
+    stack = [term]
+    while stack:
+        node = stack[-1]
+        if node._summary is not None:
+            stack.pop()
+            continue
+        if hasattr(node, 'func'):
+            func, arg = node.func, node.arg
+            if func._summary is None or arg._summary is None:
+                stack.append(func)
+                stack.append(arg)
+                continue
+            node._summary = app_summary(func._summary, arg._summary)
+        elif hasattr(node, 'body'):
+            if node.body._summary is None:
+                stack.append(node.body)
+                continue
+            node._summary = abs_summary(node.param, node.body._summary)
+        elif hasattr(node, 'name'):
+            node._summary = var_summary(node.name)
+        else:
+            node._summary = lit_summary(node.value)
+        stack.pop()
+    return term._summary
+
+
+def innermost(scope: dict[str, list[int]], name: str) -> int:
+    """The level of the binder of `name`, 0 when it is free."""
+    levels = scope.get(name)
+    return levels[-1] if levels else 0
+
+
+def alpha_equal(left, right) -> bool:
+    """Whether `left` and `right` are equal up to the names of parameters.
+    Both are terms of the same calculi. Summaries are used where known, and
+    not computed for the comparison."""
+    if left is right:
+        return True
+    if type(left) is not type(right):
+        return False
+    if left._summary is not None and right._summary is not None and left._summary[1] != right._summary[1]:
+        return False
+    # name: levels of the enclosing binders of that name, innermost last
+    left_scope: dict[str, list[int]] = {}
+    right_scope: dict[str, list[int]] = {}
+    level = 0
+    # pairs still to compare; None closes the scope of the abstractions below it
+    stack: list[Union[tuple, None]] = [(left, right)]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            a, b = stack.pop()
+            left_scope[a.param].pop()
+            right_scope[b.param].pop()
+            level -= 1
+            continue
+        a, b = item
+        a_summary, b_summary = a._summary, b._summary
+        if a is b:
+            # the same subterm matches itself if its free variables are bound
+            # alike on both sides
+            free_vars = a_summary[2] if a_summary is not None else getattr(a, 'free_vars', None)
+            if level == 0 or (free_vars is not None and all(
+                    innermost(left_scope, name) == innermost(right_scope, name) for name in free_vars)):
+                continue
+        if type(a) is not type(b):
+            return False
+        if a_summary is not None and b_summary is not None and a_summary[0] != b_summary[0]:
+            return False
+        if hasattr(a, 'func'):
+            stack.append((a.arg, b.arg))
+            stack.append((a.func, b.func))
+        elif hasattr(a, 'body'):
+            level += 1
+            left_scope.setdefault(a.param, []).append(level)
+            right_scope.setdefault(b.param, []).append(level)
+            stack.append((a, b))
+            stack.append(None)
+            stack.append((a.body, b.body))
+        elif hasattr(a, 'name'):
+            a_level = innermost(left_scope, a.name)
+            if a_level != innermost(right_scope, b.name) or (a_level == 0 and a.name != b.name):
+                return False
+        elif a.value != b.value or type(a.value) is not type(b.value):
+            return False
+    return True
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import sys
+import importlib.util
+from collections.abc import Mapping
+from types import ModuleType
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from . import calculi_vanilla, calculi_lazy, calculi_optimized, calculi_debruijn, calculi_machine, calculi_nbe
+
+    Term = Union[
+        calculi_vanilla.Term, calculi_lazy.Term, calculi_optimized.Term,
+        calculi_debruijn.Term, calculi_machine.Term, calculi_nbe.Term,
+    ]
+
+# The calculi by name. A calculi's module is imported the first time it is
+# asked for, not along with the parser or anything else able to handle
+# several of them, so a run only pays for the calculi it uses; the Cython
+# extensions are the costliest to load.
+#
+# calculi: (module, names of the Var, App and Abs the parser builds with)
+REGISTRY = {
+    'Vanilla': ('.calculi_vanilla', ('Var', 'App', 'Abs')),
+    'Lazy': ('.calculi_lazy', ('Var', 'App', 'Abs')),
+    'Optimized': ('.calculi_optimized', ('VarFact', 'AppFact', 'AbsFact')),
+    'DeBruijn': ('.calculi_debruijn', ('Var', 'App', 'AbsNamed')),
+    'Machine': ('.calculi_machine', ('Var', 'App', 'Abs')),
+    'NbE': ('.calculi_nbe', ('Var', 'App', 'Abs')),
+}
+
+
+def register(calculi: str, module: str, constructors: tuple[str, str, str] = ('Var', 'App', 'Abs')):
+    """Adds a calculi, `module` being absolute or relative to this package."""
+    REGISTRY[calculi] = module, constructors
+
+
+def module(calculi: str) -> ModuleType:
+    return importlib.import_module(REGISTRY[calculi][0], __package__)
+
+
+def loaded() -> list[str]:
+    """The calculi whose module has been imported so far."""
+    return [calculi for calculi, (name, _) in REGISTRY.items()
+            if importlib.util.resolve_name(name, __package__) in sys.modules]
+
+
+class Backends(Mapping):
+    """calculi: (Var, App, Abs), each calculi imported on first lookup."""
+
+    def __init__(self):
+        self.constructors = {}
+
+    def __getitem__(self, calculi: str) -> tuple:
+        constructors = self.constructors.get(calculi)
+        if constructors is None:
+            calculi_module = module(calculi)
+            constructors = tuple(getattr(calculi_module, name) for name in REGISTRY[calculi][1])
+            self.constructors[calculi] = constructors
+        return constructors
+
+    def __contains__(self, calculi: object) -> bool:
+        return calculi in REGISTRY
+
+    def __iter__(self):
+        return iter(REGISTRY)
+
+    def __len__(self) -> int:
+        return len(REGISTRY)
+
+
+BACKENDS = Backends()
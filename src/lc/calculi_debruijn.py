@@ -0,0 +1,288 @@
+from __future__ import annotations
+from abc import ABC
+
+from src.common.utils import get_nth_lex_string
+from src.lc.printer import to_string
+
+# Locally nameless representation: variables bound by an enclosing `Abs` are
+# de Bruijn indices (`Idx`), free variables keep their names (`Var`).
+# Parameter names are only kept as hints for printing, so substitution never
+# needs to alpha-rename and never looks at free-variable sets. Nor does
+# equality: every term hashes its structure as it is built, which makes the
+# hash alpha-invariant for free, and a differing hash settles a comparison.
+
+
+# All traversals below run on an explicit stack, so the depth of a term is
+# bounded by the heap rather than by the interpreter's recursion limit.
+
+# continuation frames of reduce
+BUILD_ABS, REDUCE_FUNC_DONE, REDUCE_ARG_DONE = range(3)
+
+
+class Term(ABC):
+    # 1 + the largest index pointing outside of the term, 0 for locally closed terms
+    loose: int
+    _hash: int
+
+    def shift(self, d: int, cutoff: int = 0) -> 'Term':
+        return rebuild(self, cutoff, lambda index, depth: Idx(index + d))
+
+    def instantiate(self, value: 'Term', depth: int = 0) -> 'Term':
+        """The body of an abstraction with `value` for its index `depth`."""
+        return rebuild(self, depth, lambda index, at: value.shift(at) if index == at else Idx(index - 1))
+
+    def reduce(self) -> 'Term':
+        # One normal-order step. `reduce` hands back the very same object when
+        # there is no redex, so identity is enough to tell whether a subterm
+        # changed.
+        stack = []
+        term = self
+        while True:
+            while True:
+                kind = type(term)
+                if kind is App:
+                    if type(term.func) is Abs:
+                        result = term.func.body.instantiate(term.arg)
+                        break
+                    stack.append((REDUCE_FUNC_DONE, term))
+                    term = term.func
+                elif kind is Abs:
+                    stack.append((BUILD_ABS, term))
+                    term = term.body
+                else:
+                    result = term
+                    break
+
+            while stack:
+                kind, node = stack.pop()
+                if kind == BUILD_ABS:
+                    result = node if result is node.body else Abs(node.param, result)
+                elif kind == REDUCE_FUNC_DONE:
+                    if result is not node.func:
+                        result = App(result, node.arg)
+                    else:
+                        stack.append((REDUCE_ARG_DONE, node))
+                        term = node.arg
+                        break
+                else:
+                    result = node if result is node.arg else App(node.func, result)
+            else:
+                return result
+
+    def step(self) -> ('Term', bool):
+        reduced = self.reduce()
+        return reduced, reduced is not self
+
+    def normalize(self, n_steps: int = -1) -> ('Term', int):
+        term = self
+        prev = None
+        i = 0
+        while term is not prev:
+            if -1 < n_steps == i:
+                break
+            prev = term
+            term = term.reduce()
+            i += 1
+        return term, i
+
+    def free_names(self) -> set[str]:
+        names = set()
+        stack = [self]
+        while stack:
+            term = stack.pop()
+            if isinstance(term, Var):
+                names.add(term.name)
+            elif isinstance(term, App):
+                stack.append(term.func)
+                stack.append(term.arg)
+            elif isinstance(term, Abs):
+                stack.append(term.body)
+        return names
+
+    def __str__(self) -> str:
+        return to_string(self)
+
+    def __repr__(self) -> str:
+        # fully parenthesized; __str__ is src/lc/printer.py
+        free = self.free_names()
+        # params of the enclosing abstractions, innermost last
+        names = []
+        out = []
+        # strings are emitted as they are, None closes the scope of an abstraction
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            kind = type(item)
+            if item is None:
+                names.pop()
+            elif kind is str:
+                out.append(item)
+            elif kind is Var:
+                out.append(item.name)
+            elif kind is Idx:
+                out.append(names[-1 - item.index] if item.index < len(names) else f"#{item.index}")
+            elif kind is App:
+                stack += (")", item.arg, " ", item.func)
+                out.append("(")
+            else:
+                param = item.fresh_param(names, free)
+                names.append(param)
+                stack += (None, ")", item.body)
+                out.append(f"(\\{param}. ")
+        return "".join(out)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
+class Var(Term):
+    name: str
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loose = 0
+        self._hash = hash(("v", name))
+
+    def __eq__(self, other):
+        return isinstance(other, Var) and self.name == other.name
+
+    __hash__ = Term.__hash__
+
+
+class Idx(Term):
+    index: int
+
+    def __init__(self, index: int):
+        self.index = index
+        self.loose = index + 1
+        self._hash = hash(("i", index))
+
+    def __eq__(self, other):
+        return isinstance(other, Idx) and self.index == other.index
+
+    __hash__ = Term.__hash__
+
+
+class App(Term):
+    func: 'Term'
+    arg: 'Term'
+
+    def __init__(self, func: 'Term', arg: 'Term'):
+        self.func = func
+        self.arg = arg
+        self.loose = max(func.loose, arg.loose)
+        self._hash = hash(("a", func._hash, arg._hash))
+
+    def __eq__(self, other):
+        return equal(self, other)
+
+    __hash__ = Term.__hash__
+
+
+class Abs(Term):
+    param: str
+    body: 'Term'
+
+    def __init__(self, param: str, body: 'Term'):
+        self.param = param
+        self.body = body
+        self.loose = max(body.loose - 1, 0)
+        self._hash = hash(("l", body._hash))
+
+    def __eq__(self, other):
+        # parameter names are printing hints only, so this is alpha-equivalence
+        return equal(self, other)
+
+    __hash__ = Term.__hash__
+
+    def fresh_param(self, names: list[str], free: set[str]) -> str:
+        # The hint may be reused unless it would capture a free variable or
+        # shadow an outer binder the body still refers to.
+        outer = names[max(len(names) - self.body.loose + 1, 0):] if self.body.loose > 1 else []
+        i = 0
+        while True:
+            param = self.param + get_nth_lex_string(i)
+            if param not in free and param not in outer:
+                return param
+            i += 1
+
+
+def rebuild(term: Term, depth: int, loose) -> Term:
+    """`term` with every index pointing above its `depth` enclosing binders
+    replaced by `loose(index, binders above it within term + depth)`.
+    Subterms without such indices are kept as they are."""
+    # (subterm, binders above it, whether its parts are done)
+    stack = [(term, depth, False)]
+    done = []
+    while stack:
+        node, at, expanded = stack.pop()
+        if expanded:
+            if type(node) is App:
+                arg, func = done.pop(), done.pop()
+                done.append(App(func, arg))
+            else:
+                done.append(Abs(node.param, done.pop()))
+        elif node.loose <= at:
+            done.append(node)
+        elif type(node) is Idx:
+            done.append(loose(node.index, at))
+        elif type(node) is App:
+            stack += ((node, at, True), (node.arg, at, False), (node.func, at, False))
+        else:
+            stack += ((node, at, True), (node.body, at + 1, False))
+    return done[0]
+
+
+def equal(first: Term, second: Term) -> bool:
+    # structural, which up to the hints of parameters is alpha-equivalence;
+    # a differing hash settles most comparisons at once
+    stack = [(first, second)]
+    while stack:
+        first, second = stack.pop()
+        if first is second:
+            continue
+        kind = type(first)
+        if kind is not type(second) or first._hash != second._hash:
+            return False
+        if kind is App:
+            stack.append((first.arg, second.arg))
+            stack.append((first.func, second.func))
+        elif kind is Abs:
+            stack.append((first.body, second.body))
+        elif first != second:
+            return False
+    return True
+
+
+def close(term: Term, name: str) -> Term:
+    """`term` with the variables named `name` turned into the index of a
+    binder right above it. One pass with an explicit stack, so deep terms
+    do not run out of recursion."""
+    # (subterm, binders between it and `term`, whether its parts are done)
+    stack = [(term, 0, False)]
+    done = []
+    while stack:
+        node, depth, expanded = stack.pop()
+        if expanded:
+            if isinstance(node, App):
+                arg, func = done.pop(), done.pop()
+                done.append(node if func is node.func and arg is node.arg else App(func, arg))
+            else:
+                body = done.pop()
+                done.append(node if body is node.body else Abs(node.param, body))
+        elif isinstance(node, Var):
+            done.append(Idx(depth) if node.name == name else node)
+        elif isinstance(node, App):
+            stack += ((node, depth, True), (node.arg, depth, False), (node.func, depth, False))
+        elif isinstance(node, Abs):
+            stack += ((node, depth, True), (node.body, depth + 1, False))
+        else:
+            done.append(node)
+    return done[0]
+
+
+def AbsNamed(param: str, body: Term) -> Abs:
+    """Builds `\\param. body` from a body that refers to `param` by name.
+    This walks the whole body, so a parser nesting binders is better off
+    handing `Abs` bodies that already use indices, as LambdaParser does."""
+    return Abs(param, close(body, param))
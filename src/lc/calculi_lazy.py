@@ -1,33 +1,281 @@
 from __future__ import annotations
-import re
-from abc import ABC, abstractmethod
-from typing import Dict, Tuple
+from typing import Optional, Tuple
 
-from src.common.utils import get_random_var_name
+from src.common.persistent import EMPTY, PersistentMap
+from src.common.symbols import fresh, singleton, union, without
+from src.lc.alpha import alpha_equal, summary
 
-Env = Dict[str, 'Term']
+# Reduction counters, see src/lc/instrument.py. They only count while
+# `_instrumented` is set, so an event costs a single flag test otherwise;
+# hooks are called with (calculi, event, term) on top of the counting.
+_instrumented = False
+_hooks = ()
+_counters = dict.fromkeys(("betas", "substs", "renames", "nf_hits"), 0)
 
 
-class Term(ABC):
-    free_vars: set[str]
+def set_instrumentation(enabled: bool, hooks: tuple = ()):
+    global _instrumented, _hooks
+    _instrumented = enabled
+    _hooks = hooks
+
+
+def instrumentation_counters() -> dict:
+    return dict(_counters)
+
+
+def reset_instrumentation():
+    for name in _counters:
+        _counters[name] = 0
+
+
+def _event(event: str, term: 'Term'):
+    _counters[event + "s"] += 1
+    for hook in _hooks:
+        hook("Lazy", event, term)
+
+
+class Env:
+    """The bindings of lazy_reduce, name: term. Binding returns a new Env and
+    leaves this one as it is, sharing all but O(log n) of it. Names keep the
+    position they were first bound at, which normalize substitutes back in.
+    The names of the variables bound as values are counted, so that finding
+    a variable among the values takes a lookup instead of a scan."""
+    __slots__ = ('bindings', 'var_values', 'size')
+
+    def __init__(self, bindings: PersistentMap = EMPTY, var_values: PersistentMap = EMPTY, size: int = 0):
+        # name: (position, term)
+        self.bindings = bindings
+        # name of a variable: how many names it is bound to
+        self.var_values = var_values
+        self.size = size
+
+    def get(self, name: str) -> Optional['Term']:
+        binding = self.bindings.get(name)
+        return None if binding is None else binding[1]
+
+    def bind(self, name: str, value: 'Term') -> 'Env':
+        old = self.bindings.get(name)
+        var_values = self.var_values
+        if old is not None and type(old[1]) is Var:
+            var_values = var_values.set(old[1].name, var_values.get(old[1].name) - 1)
+        if type(value) is Var:
+            var_values = var_values.set(value.name, var_values.get(value.name, 0) + 1)
+        position = self.size if old is None else old[0]
+        return Env(self.bindings.set(name, (position, value)), var_values, self.size + (old is None))
+
+    def binds_var(self, var: 'Var') -> bool:
+        """Whether `var` is the value of some name."""
+        return self.var_values.get(var.name, 0) > 0
+
+    def items(self) -> list[tuple[str, 'Term']]:
+        """The bindings, in the order their names were first bound."""
+        # positions run from 0 to size - 1, one per name
+        entries = [None] * self.size
+        for name, (position, value) in self.bindings.items():
+            entries[position] = name, value
+        return entries
+
+
+# All traversals below run on an explicit stack, so term depth is bounded by
+# the heap rather than by the interpreter's recursion limit. Each one mirrors
+# the straightforward recursive definition: descending pushes a continuation
+# frame, and the result of a subterm is handed back to the frame on top.
+
+# continuation frames
+SUBST_ARG, BUILD_APP, BUILD_ABS, RENAME = range(4)
+REDUCE_FUNC_DONE, REDUCE_ARG_DONE = range(4, 6)
+BIND_VAR, ENTER_FUNC = range(6, 8)
+
+
+class Term:
+    free_vars: frozenset[str]
+    # see src/lc/alpha.py
+    _summary = None
+    normal = False
 
-    @abstractmethod
     def subst(self, var: str, value: 'Term') -> 'Term':
-        pass
+        # `var` and `value` only change across a RENAME frame, which saves them
+        if _instrumented:
+            _event("subst", self)
+        stack = []
+        term = self
+        while True:
+            # descend until the substitution of `term` is known
+            while True:
+                kind = type(term)
+                if kind is Var:
+                    result = value if term.name == var else term
+                    break
+                if kind is App:
+                    if var not in term.free_vars:
+                        # nothing to replace, and so nothing to rename either
+                        result = term
+                        break
+                    func = term.func
+                    if type(func) is Var:
+                        # a variable in function position is substituted on the spot
+                        stack.append((BUILD_APP, value if func.name == var else func))
+                        term = term.arg
+                        continue
+                    stack.append((SUBST_ARG, term.arg))
+                    term = func
+                    continue
+
+                if term.param == var:
+                    result = term
+                    break
+                var_free = var in term.body.free_vars
+                captures = term.param in value.free_vars
+                if not var_free and not captures:
+                    result = term
+                    break
+                if not var_free or not captures:
+                    stack.append((BUILD_ABS, term.param))
+                    term = term.body
+                    continue
+
+                # rename the parameter first, then substitute into the renamed body
+                if _instrumented:
+                    _event("rename", term)
+                new_variable = fresh(term.body.free_vars, value.free_vars)
+                stack.append((RENAME, (new_variable, var, value)))
+                var, value = term.param, Var(new_variable)
+                term = term.body
+
+            # hand the result back up until a frame needs another subterm
+            while stack:
+                kind, node = stack.pop()
+                if kind == SUBST_ARG:
+                    stack.append((BUILD_APP, result))
+                    term = node
+                    break
+                elif kind == BUILD_APP:
+                    result = App(node, result)
+                elif kind == BUILD_ABS:
+                    result = Abs(node, result)
+                else:
+                    new_variable, var, value = node
+                    stack.append((BUILD_ABS, new_variable))
+                    term = result
+                    break
+            else:
+                return result
 
-    @abstractmethod
     def reduce(self) -> 'Term':
-        pass
+        # One normal-order step. The very same object comes back when there is
+        # no redex, so identity tells whether anything changed; subterms found
+        # to be redex-free are flagged `normal` and skipped by later steps.
+        stack = []
+        term = self
+        instrumented = _instrumented
+        while True:
+            while True:
+                if term.normal:
+                    if instrumented:
+                        _event("nf_hit", term)
+                    result = term
+                    break
+                kind = type(term)
+                if kind is App:
+                    if type(term.func) is Abs:
+                        if instrumented:
+                            _event("beta", term)
+                        result = term.func.body.subst(term.func.param, term.arg)
+                        if type(term.arg) is Abs and type(result) is App and type(result.func) is Abs and result == term:
+                            # a redex that reproduces itself, like (\x. x x) \x. x x, whose
+                            # argument can only be an abstraction and contractum only a redex
+                            result = term
+                        break
+                    stack.append((REDUCE_FUNC_DONE, term))
+                    term = term.func
+                elif kind is Abs:
+                    stack.append((BUILD_ABS, term))
+                    term = term.body
+                else:
+                    result = term
+                    break
+
+            while stack:
+                kind, node = stack.pop()
+                if kind == BUILD_ABS:
+                    if result is not node.body:
+                        result = Abs(node.param, result)
+                    else:
+                        node.normal = result.normal
+                        result = node
+                elif kind == REDUCE_FUNC_DONE:
+                    if result is not node.func:
+                        result = App(result, node.arg)
+                    else:
+                        stack.append((REDUCE_ARG_DONE, node))
+                        term = node.arg
+                        break
+                elif result is not node.arg:
+                    result = App(node.func, result)
+                else:
+                    node.normal = node.func.normal and result.normal
+                    result = node
+            else:
+                return result
+
+    def step(self) -> ('Term', bool):
+        reduced = self.reduce()
+        return reduced, reduced is not self
 
-    @abstractmethod
     def lazy_reduce(self, env: Env) -> Tuple[Env, 'Abs']:
-        pass
+        stack = []
+        term = self
+        while True:
+            while True:
+                if isinstance(term, Abs):
+                    result = env, term
+                    break
+                if isinstance(term, App):
+                    stack.append((ENTER_FUNC, term, env))
+                    term = term.func
+                    continue
+
+                name = term.name
+                bound = env.get(name)
+                if bound is None:
+                    # raise NameError(f"Unbound variable: {name}")
+                    result = env, term
+                    break
+                if env.binds_var(term):
+                    # raise NameError(f"Recursion with: {name}")
+                    result = env, term
+                    break
+
+                if isinstance(bound, Abs):
+                    result = env, bound
+                    break
+                stack.append((BIND_VAR, name, None))
+                term = bound
+
+            while stack:
+                kind, node, saved_env = stack.pop()
+                env_2, value = result
+                if kind == BIND_VAR:
+                    result = env_2.bind(node, value), value
+                    continue
+
+                if not isinstance(value, Abs):
+                    # raise RuntimeError(
+                    #     f"Non-lambda function in application: {value!r}"
+                    # )
+                    result = saved_env, node
+                    continue
+                env = env_2.bind(value.param, node.arg)
+                term = value.body
+                break
+            else:
+                return result
 
     def energetic_normalize(self, n_steps: int = -1) -> ('Term', int):
         term = self
         prev = None
         i = 0
-        while term != prev:
+        while term is not prev:
             if -1 < n_steps == i:
                 break
             prev = term
@@ -35,10 +283,17 @@ class Term(ABC):
             i += 1
         return term, i
 
-    def normalize(self) -> ('Term', int):
-        env, term = self.lazy_reduce({})
+    def normalize(self, n_steps: int = -1) -> ('Term', int):
+        if n_steps > -1:
+            # the call-by-need pass below has no notion of a step, so a
+            # bounded run takes the stepwise strategy, which counts them
+            return self.energetic_normalize(n_steps)
+        env, term = self.lazy_reduce(Env())
         cumulative_steps = 0
         for name, bound in reversed(env.items()):
+            if name not in term.free_vars:
+                # nothing to substitute, so the binding is not worth normalizing
+                continue
             bound_normalized, n_steps = bound.energetic_normalize()
             term = term.subst(name, bound_normalized)
             cumulative_steps += n_steps
@@ -46,15 +301,76 @@ class Term(ABC):
         term_normalized, n_steps = term.energetic_normalize()
         return term_normalized, cumulative_steps + n_steps
 
+    def __eq__(self, other):
+        # equality up to the names of parameters, mostly settled by the hashes
+        return alpha_equal(self, other)
+
+    def __hash__(self) -> int:
+        return summary(self)[1]
+
+    def __str__(self) -> str:
+        # a function is parenthesized when it is an abstraction or an
+        # application ending in one, an argument when it is an application,
+        # a body never
+        out = []
+        emit = out.append
+        stack = [self]
+        pop, push = stack.pop, stack.append
+        while stack:
+            item = pop()
+            kind = type(item)
+            if kind is str:
+                emit(item)
+            elif kind is Var:
+                emit(item.name)
+            elif kind is App:
+                func, arg = item.func, item.arg
+                if type(arg) is App:
+                    stack += (")", arg, "(", " ")
+                else:
+                    push(arg)
+                    push(" ")
+                if type(func) is Abs or (type(func) is App and type(func.arg) is Abs):
+                    stack += (")", func, "(")
+                else:
+                    push(func)
+            else:
+                push(item.body)
+                emit(f"\\{item.param}. ")
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        out = []
+        emit = out.append
+        stack = [self]
+        pop = stack.pop
+        while stack:
+            item = pop()
+            kind = type(item)
+            if kind is str:
+                emit(item)
+            elif kind is Var:
+                emit(item.name)
+            elif kind is App:
+                stack += (")", item.arg, " ", item.func)
+                emit("(")
+            else:
+                stack += (")", item.body)
+                emit(f"(\\{item.param}. ")
+        return "".join(out)
+
 
 class Var(Term):
     name: str
+    normal = True
 
     def __init__(self, name: str):
         self.name = name
-        self.free_vars = {name}
+        self.free_vars = singleton(name)
 
     def subst(self, var: str, value: 'Term') -> 'Term':
+        if _instrumented:
+            _event("subst", self)
         if self.name == var:
             return value
         return self
@@ -62,27 +378,6 @@ class Var(Term):
     def reduce(self) -> 'Term':
         return self
 
-    def lazy_reduce(self, env: Env) -> Tuple[Env, 'Abs']:
-        name = self.name
-        if name not in env:
-            # raise NameError(f"Unbound variable: {name}")
-            return env, self
-        if self in env.values():
-            # raise NameError(f"Recursion with: {name}")
-            return env, self
-
-        bound = env[name]
-        if isinstance(bound, Abs):
-            return env, bound
-
-        env_2, value = bound.lazy_reduce(env)
-        ext_env_2 = dict(env_2)
-        ext_env_2[name] = value
-        return ext_env_2, value
-
-    def __eq__(self, other):
-        return isinstance(other, Var) and self.name == other.name
-
     def __str__(self) -> str:
         return self.name
 
@@ -97,58 +392,7 @@ class App(Term):
     def __init__(self, func: 'Term', arg: 'Term'):
         self.func = func
         self.arg = arg
-        self.free_vars = func.free_vars | arg.free_vars
-
-    def subst(self, var: str, value: 'Term') -> 'Term':
-        return App(
-            self.func.subst(var, value),
-            self.arg.subst(var, value)
-        )
-
-    def reduce(self) -> 'Term':
-        if isinstance(self.func, Abs):
-            return self.func.body.subst(self.func.param, self.arg)
-
-        reduced_func = self.func.reduce()
-        if reduced_func != self.func:
-            return App(reduced_func, self.arg)
-
-        reduced_arg = self.arg.reduce()
-        if reduced_arg != self.arg:
-            return App(self.func, reduced_arg)
-
-        return self
-
-    def lazy_reduce(self, env) -> Tuple[Env, 'Abs']:
-        env_2, func_reduced = self.func.lazy_reduce(env)
-        if not isinstance(func_reduced, Abs):
-            # raise RuntimeError(
-            #     f"Non-lambda function in application: {func_reduced!r}"
-            # )
-            return env, self
-
-        ext_env_2 = dict(env_2)
-        ext_env_2[func_reduced.param] = self.arg
-        return func_reduced.body.lazy_reduce(ext_env_2)
-
-    def __eq__(self, other):
-        return isinstance(other, App) and self.func == other.func and self.arg == other.arg
-
-    def __str__(self) -> str:
-        func_str = f"({self.func})"
-        if (isinstance(self.func, App) and isinstance(self.func.func, App) and isinstance(self.func.arg,
-                                                                                          App)) or isinstance(self.func,
-                                                                                                              Var):
-            func_str = re.sub(r"^\((.*)\)$", r"\1", func_str)
-
-        arg_str = f"({self.arg})"
-        if isinstance(self.arg, Abs) or isinstance(self.arg, Var):
-            arg_str = re.sub(r"^\((.*)\)$", r"\1", arg_str)
-
-        return f"{func_str} {arg_str}"
-
-    def __repr__(self) -> str:
-        return f"({repr(self.func)} {repr(self.arg)})"
+        self.free_vars = union(func.free_vars, arg.free_vars)
 
 
 class Abs(Term):
@@ -158,41 +402,4 @@ class Abs(Term):
     def __init__(self, param: str, body: 'Term'):
         self.param = param
         self.body = body
-        self.free_vars = body.free_vars - {param}
-
-    def subst(self, var: str, value: 'Term') -> 'Term':
-        if self.param == var:
-            return self
-        elif var not in self.body.free_vars and self.param not in value.free_vars:
-            return self
-        elif var not in self.body.free_vars or self.param not in value.free_vars:
-            return Abs(
-                self.param,
-                self.body.subst(var, value)
-            )
-
-        new_variable = get_random_var_name()
-        alpha_step = self.body.subst(self.param, Var(new_variable))
-        subst_step = alpha_step.subst(var, value)
-        return Abs(
-            new_variable,
-            subst_step
-        )
-
-    def reduce(self) -> 'Term':
-        return Abs(self.param, self.body.reduce())
-
-    def lazy_reduce(self, env) -> Tuple[Env, 'Abs']:
-        return env, self
-
-    def __eq__(self, other):
-        return isinstance(other, Abs) and self.param == other.param and self.body == other.body
-
-    def __str__(self) -> str:
-        body_str = f"({self.body})"
-        if isinstance(self.body, (App, Abs)) or isinstance(self.body, Var):
-            body_str = re.sub(r"^\((.*)\)$", r"\1", body_str)
-        return f"\\{self.param}. {body_str}"
-
-    def __repr__(self) -> str:
-        return f"(\\{self.param}. {repr(self.body)})"
+        self.free_vars = without(body.free_vars, param)
@@ -0,0 +1,444 @@
+from __future__ import annotations
+from abc import ABC
+from functools import lru_cache
+from typing import Optional, Union
+
+from src.common.utils import get_nth_lex_string
+from src.lc.alpha import alpha_equal, summary
+from src.lc.printer import to_string
+
+# Call-by-need Krivine machine. A term is compiled once into de Bruijn code,
+# arguments become shared thunks in linked environments and are overwritten
+# with their weak head normal form the first time they are forced, so every
+# use of a bound variable sees the same evaluation. The full normal form is
+# read back at the end by evaluating under binders with fresh variables.
+# Compiling, evaluating, arguments of primitives included, and reading back
+# all run on explicit stacks, so the depth of a term costs no recursion.
+#
+# The machine also knows native constants (Python ints and bools) and a set of
+# primitive operators on them, so arithmetic is a single delta step instead of
+# a chain of beta reductions. Church encodings are only met at the boundary: a
+# constant applied like a function is expanded into its encoding, and an
+# encoded argument of a primitive is decoded by applying it to native
+# successor and zero, or to TRUE and FALSE.
+
+
+class Term(ABC):
+    # see src/lc/alpha.py
+    _summary = None
+
+    def normalize(self, n_steps: int = -1) -> ('Term', int):
+        machine = Machine(n_steps)
+        return machine.run(self), machine.steps
+
+    def __eq__(self, other):
+        # equality up to the names of parameters, mostly settled by the hashes
+        return alpha_equal(self, other)
+
+    def __hash__(self) -> int:
+        return summary(self)[1]
+
+
+class Var(Term):
+    name: str
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+class App(Term):
+    func: 'Term'
+    arg: 'Term'
+
+    def __init__(self, func: 'Term', arg: 'Term'):
+        self.func = func
+        self.arg = arg
+
+    def __str__(self) -> str:
+        return to_string(self)
+
+    def __repr__(self) -> str:
+        return to_string(self)
+
+
+class Abs(Term):
+    param: str
+    body: 'Term'
+
+    def __init__(self, param: str, body: 'Term'):
+        self.param = param
+        self.body = body
+
+    def __str__(self) -> str:
+        return to_string(self)
+
+    def __repr__(self) -> str:
+        return to_string(self)
+
+
+class Lit(Term):
+    value: Union[int, bool]
+
+    def __init__(self, value: Union[int, bool]):
+        self.value = value
+
+    def __str__(self) -> str:
+        if type(self.value) is bool:
+            return "TRUE" if self.value else "FALSE"
+        return str(self.value)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+# kinds of primitive arguments: decoded to a native value before the delta
+# rule runs, or passed on as an unevaluated thunk
+INT, BOOL, LAZY = range(3)
+
+# name: (argument kinds, delta rule); a rule returning None leaves the
+# application stuck, a LAZY argument it returns is evaluated in its place
+PRIMITIVES = {
+    'SUCC': ((INT,), lambda n: n + 1),
+    '+': ((INT, INT), lambda m, n: m + n),
+    '-': ((INT, INT), lambda m, n: max(m - n, 0)),
+    '*': ((INT, INT), lambda m, n: m * n),
+    '/': ((INT, INT), lambda m, n: m // n if n else None),
+    'ISZERO': ((INT,), lambda n: n == 0),
+    '<=': ((INT, INT), lambda m, n: m <= n),
+    '>=': ((INT, INT), lambda m, n: m >= n),
+    '==': ((INT, INT), lambda m, n: m == n),
+    '<': ((INT, INT), lambda m, n: m < n),
+    '>': ((INT, INT), lambda m, n: m > n),
+    '~': ((BOOL,), lambda p: not p),
+    '&': ((BOOL, LAZY), lambda p, q: q if p else False),
+    '|': ((BOOL, LAZY), lambda p, q: True if p else q),
+    'IF': ((BOOL, LAZY, LAZY), lambda p, a, b: a if p else b),
+}
+
+CONSTANTS = {'TRUE': True, 'FALSE': False}
+
+
+# Machine code: (IDX, index) | (FREE, name) | (APP, func, arg) | (LAM, param, body)
+#             | (CONST, value) | (PRIM, name)
+IDX, FREE, APP, LAM, CONST, PRIM = range(6)
+
+# tasks of Machine.read_back
+READ, FORCE, BIND, APPLY = range(4)
+
+# applies the value at index 2 to the ones at indices 1 and 0
+DECODE = APP, (APP, (IDX, 2), (IDX, 1)), (IDX, 0)
+
+
+@lru_cache(maxsize=None)
+def church_code(value: Union[int, bool]) -> tuple:
+    """The Church encoding of a native constant, as machine code."""
+    if type(value) is bool:
+        return LAM, 'x', (LAM, 'y', (IDX, 1 if value else 0))
+    body = IDX, 0
+    for _ in range(value):
+        body = APP, (IDX, 1), body
+    return LAM, 's', (LAM, 'z', body)
+
+
+def compile_term(term: Term, free: set[str]) -> tuple:
+    """Translates a named term into machine code, collecting its free names into `free`."""
+    # code of the closed subterms, by identity: a term shared by several uses,
+    # like a let definition, is compiled once
+    shared = {}
+
+    # params of the enclosing binders, innermost last
+    scope = []
+    # the code of every subterm done, with how many enclosing binders it
+    # depends on; a free name depends on all of them, as a binder further
+    # out might capture it
+    results = []
+    # (subterm, whether its parts are done), an explicit stack so that deep
+    # terms do not exhaust recursion
+    stack = [(term, False)]
+    while stack:
+        term, done = stack.pop()
+        if not done:
+            code = shared.get(id(term))
+            if code is not None:
+                results.append((code, 0))
+            elif isinstance(term, Var):
+                for i in range(len(scope) - 1, -1, -1):
+                    if scope[i] == term.name:
+                        results.append(((IDX, len(scope) - 1 - i), len(scope) - i))
+                        break
+                else:
+                    if term.name in PRIMITIVES:
+                        results.append(((PRIM, term.name), 0))
+                    else:
+                        free.add(term.name)
+                        results.append(((FREE, term.name), len(scope) + 1))
+            elif isinstance(term, Lit):
+                results.append(((CONST, term.value), 0))
+            elif isinstance(term, App):
+                stack += ((term, True), (term.arg, False), (term.func, False))
+            else:
+                scope.append(term.param)
+                stack += ((term, True), (term.body, False))
+            continue
+
+        if isinstance(term, App):
+            (arg, arg_depth), (func, func_depth) = results.pop(), results.pop()
+            code, depth = (APP, func, arg), max(func_depth, arg_depth)
+        else:
+            scope.pop()
+            body, body_depth = results.pop()
+            code, depth = (LAM, term.param, body), max(body_depth - 1, 0)
+        if depth == 0:
+            shared[id(term)] = code
+        results.append((code, depth))
+
+    return results[0][0]
+
+
+class Thunk:
+    __slots__ = ('code', 'env', 'value')
+
+    def __init__(self, code: Optional[tuple], env: Optional[tuple]):
+        self.code = code
+        self.env = env
+        self.value = None
+
+
+def evaluated(value: Union['Closure', 'Neutral', 'Partial', int, bool]) -> Thunk:
+    thunk = Thunk(None, None)
+    thunk.value = value
+    return thunk
+
+
+class Update:
+    __slots__ = ('thunk',)
+
+    def __init__(self, thunk: Thunk):
+        self.thunk = thunk
+
+
+class Delta:
+    # a primitive given all its arguments, on the stack while its strict ones
+    # are evaluated in turn: `values` holds those before the one awaited,
+    # decoded, and the LAZY ones as thunks; `decoding` is set while the
+    # awaited one, an encoding, is applied to be decoded
+    __slots__ = ('partial', 'values', 'decoding')
+
+    def __init__(self, partial: 'Partial'):
+        self.partial = partial
+        self.values = []
+        self.decoding = False
+
+
+class Closure:
+    __slots__ = ('code', 'env')
+
+    def __init__(self, code: tuple, env: Optional[tuple]):
+        self.code = code
+        self.env = env
+
+
+class Partial:
+    # a primitive still waiting for some of its arguments
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name: str, args: tuple):
+        self.name = name
+        self.args = args
+
+
+class Neutral:
+    # `head` is a variable name, or a value that could not be applied because
+    # the step budget ran out or a primitive got an argument it cannot use
+    __slots__ = ('head', 'args')
+
+    def __init__(self, head: Union[str, Closure, Partial, int, bool], args: tuple):
+        self.head = head
+        self.args = args
+
+
+class Machine:
+    def __init__(self, n_steps: int = -1):
+        self.n_steps = n_steps
+        self.steps = 0
+        self.names: set[str] = set()
+
+    def run(self, term: Term) -> Term:
+        code = compile_term(term, self.names)
+        return self.read_back(self.whnf(code, None))
+
+    def whnf(self, code: tuple, env: Optional[tuple]) -> Union[Closure, Neutral, Partial, int, bool]:
+        stack = []
+        while True:
+            tag = code[0]
+            if tag == APP:
+                stack.append(Thunk(code[2], env))
+                code = code[1]
+                continue
+
+            if tag == IDX:
+                frame = env
+                for _ in range(code[1]):
+                    frame = frame[1]
+                thunk = frame[0]
+                if thunk.value is None:
+                    stack.append(Update(thunk))
+                    code, env = thunk.code, thunk.env
+                    continue
+                value = thunk.value
+            elif tag == FREE:
+                value = Neutral(code[1], ())
+            elif tag == CONST:
+                value = code[1]
+            elif tag == PRIM:
+                value = Partial(code[1], ())
+            else:
+                if stack and type(stack[-1]) is Thunk and self.steps != self.n_steps:
+                    env = (stack.pop(), env)
+                    code = code[2]
+                    self.steps += 1
+                    continue
+                value = Closure(code, env)
+
+            # unwind the stack with a value: fill pending updates, apply closures
+            while stack:
+                top = stack[-1]
+                if type(top) is Update:
+                    stack.pop()
+                    top.thunk.value = value
+                    top.thunk.code = top.thunk.env = None
+                elif type(top) is Delta:
+                    # `value` is the awaited argument of the primitive
+                    kind = PRIMITIVES[top.partial.name][0][len(top.values)]
+                    if type(value) is Closure and not top.decoding:
+                        # decoded by applying it to native successor and zero,
+                        # or to TRUE and FALSE
+                        top.decoding = True
+                        first, second = (Partial('SUCC', ()), 0) if kind == INT else (True, False)
+                        code, env = DECODE, (evaluated(second), (evaluated(first), (evaluated(value), None)))
+                        break
+                    top.decoding = False
+                    if type(value) is not (int if kind == INT else bool):
+                        stack.pop()
+                        value = Neutral(top.partial, ())
+                        continue
+                    top.values.append(value)
+                    value = self.delta(stack)
+                    if type(value) is Thunk:
+                        if value.value is None:
+                            stack.append(Update(value))
+                            code, env = value.code, value.env
+                            break
+                        value = value.value
+                elif type(value) is Closure and self.steps != self.n_steps:
+                    stack.pop()
+                    code, env = value.code[2], (top, value.env)
+                    self.steps += 1
+                    break
+                elif type(value) is Partial and self.steps != self.n_steps:
+                    stack.pop()
+                    value = Partial(value.name, value.args + (top,))
+                    if len(value.args) < len(PRIMITIVES[value.name][0]):
+                        continue
+                    # its arguments are evaluated on this same stack
+                    stack.append(Delta(value))
+                    value = self.delta(stack)
+                    if type(value) is Thunk:
+                        if value.value is None:
+                            stack.append(Update(value))
+                            code, env = value.code, value.env
+                            break
+                        value = value.value
+                elif type(value) in (int, bool) and self.steps != self.n_steps:
+                    # a constant used as a function behaves as its encoding
+                    code, env = church_code(value), None
+                    break
+                else:
+                    args = []
+                    while stack and type(stack[-1]) is Thunk:
+                        args.append(stack.pop())
+                    if type(value) is Neutral:
+                        value = Neutral(value.head, value.args + tuple(args))
+                    else:
+                        value = Neutral(value, tuple(args))
+            else:
+                return value
+
+    def force(self, thunk: Thunk) -> Union[Closure, Neutral, Partial, int, bool]:
+        if thunk.value is None:
+            thunk.value = self.whnf(thunk.code, thunk.env)
+            thunk.code = thunk.env = None
+        return thunk.value
+
+    def delta(self, stack: list) -> Union[Thunk, Closure, Neutral, Partial, int, bool]:
+        """Goes on with the Delta on top of `stack`: the next strict argument
+        to evaluate, the frame staying where it is, or else the frame popped
+        and the result of the rule, a LAZY argument to evaluate in its place
+        being returned as its thunk too."""
+        frame = stack[-1]
+        kinds, rule = PRIMITIVES[frame.partial.name]
+        args, values = frame.partial.args, frame.values
+        while len(values) < len(kinds):
+            if kinds[len(values)] != LAZY:
+                return args[len(values)]
+            values.append(args[len(values)])
+        stack.pop()
+
+        result = rule(*values) if self.steps != self.n_steps else None
+        if result is None:
+            return Neutral(frame.partial, ())
+        self.steps += 1
+        return result
+
+    def fresh_param(self, hint: str) -> str:
+        # names must stay within the parser's [a-z_]+ alphabet
+        i = 0
+        while True:
+            param = hint + get_nth_lex_string(i)
+            if param not in self.names:
+                return param
+            i += 1
+
+    def read_back(self, value: Union[Closure, Neutral, Partial, int, bool]) -> Term:
+        # An explicit stack of tasks, so that deep normal forms do not exhaust
+        # recursion: a value to read back, a thunk to force and read back, a
+        # parameter whose abstraction is built over the last term read back,
+        # or APPLY to apply the term before it to it.
+        results = []
+        tasks = [(READ, value)]
+        while tasks:
+            task, item = tasks.pop()
+            if task == FORCE:
+                task, item = READ, self.force(item)
+            if task == BIND:
+                self.names.discard(item)
+                results.append(Abs(item, results.pop()))
+            elif task == APPLY:
+                arg = results.pop()
+                results.append(App(results.pop(), arg))
+            elif type(item) is Closure:
+                param = self.fresh_param(item.code[1])
+                var = Thunk(None, None)
+                var.value = Neutral(param, ())
+                self.names.add(param)
+                tasks.append((BIND, param))
+                tasks.append((READ, self.whnf(item.code[2], (var, item.env))))
+            elif type(item) not in (Partial, Neutral):
+                results.append(Lit(item))
+            else:
+                for arg in reversed(item.args):
+                    tasks.append((APPLY, None))
+                    tasks.append((FORCE, arg))
+                if type(item) is Partial:
+                    results.append(Var(item.name))
+                elif type(item.head) is str:
+                    results.append(Var(item.head))
+                else:
+                    tasks.append((READ, item.head))
+        return results[0]
@@ -0,0 +1,225 @@
+from __future__ import annotations
+from typing import Callable, Optional, Union
+
+from src.common.utils import get_nth_lex_string
+from . import calculi_machine as named
+
+# Normalization by evaluation. A term is compiled once into Python closures,
+# so beta reduction becomes a host function call: a lambda turns into a
+# semantic function over argument thunks, and variables that are not bound
+# by any lambda become neutral values. Arguments are passed as shared,
+# memoized thunks (call-by-need), which keeps `Y`-style recursion terminating.
+# The beta-normal form is read back by applying semantic functions to fresh
+# variables.
+#
+# The closures never call one another. Each returns either a value or the
+# (code, env) to go on with, having pushed on the evaluator's stack what to
+# do with the value that code comes to: an argument thunk to apply it to, or
+# a thunk to update with it. The evaluator runs them in a loop, a trampoline,
+# and compiling and reading back keep explicit stacks too, so neither the
+# depth of a term nor a long chain of reductions nests host calls.
+
+
+class Term(named.Term):
+    def normalize(self, n_steps: int = -1) -> ('Term', int):
+        evaluator = Evaluator(n_steps)
+        return evaluator.run(self), evaluator.steps
+
+
+class Var(Term, named.Var):
+    pass
+
+
+class App(Term, named.App):
+    pass
+
+
+class Abs(Term, named.Abs):
+    pass
+
+
+class Thunk:
+    __slots__ = ('code', 'env', 'value')
+
+    def __init__(self, code: Optional[Callable], env: Optional[tuple]):
+        self.code = code
+        self.env = env
+        self.value = None
+
+
+class Update:
+    __slots__ = ('thunk',)
+
+    def __init__(self, thunk: Thunk):
+        self.thunk = thunk
+
+
+class Lam:
+    # a semantic function: `body` run in `env` extended with the argument
+    __slots__ = ('param', 'body', 'env')
+
+    def __init__(self, param: str, body: Callable, env: Optional[tuple]):
+        self.param = param
+        self.body = body
+        self.env = env
+
+
+class Neutral:
+    # `head` is a variable name, or a function that could not be applied
+    # because the step budget ran out
+    __slots__ = ('head', 'args')
+
+    def __init__(self, head: Union[str, Lam], args: tuple):
+        self.head = head
+        self.args = args
+
+
+# tasks of Evaluator.read_back
+READ, FORCE, BIND, APPLY = range(4)
+
+
+class Evaluator:
+    def __init__(self, n_steps: int = -1):
+        self.n_steps = n_steps
+        self.steps = 0
+        self.names: set[str] = set()
+        # argument thunks and updates waiting for the value being computed
+        self.stack: list[Union[Thunk, Update]] = []
+
+    def run(self, term: named.Term) -> Term:
+        code = self.compile(term)
+        return self.read_back(self.eval(code, None))
+
+    def eval(self, code: Callable, env: Optional[tuple]) -> Union[Lam, Neutral]:
+        stack = self.stack
+        result = code(env)
+        while True:
+            if type(result) is tuple:
+                code, env = result
+                result = code(env)
+                continue
+            if not stack:
+                return result
+            top = stack.pop()
+            if type(top) is Update:
+                top.thunk.value = result
+                top.thunk.code = top.thunk.env = None
+            elif type(result) is Lam:
+                if self.steps != self.n_steps:
+                    self.steps += 1
+                    result = result.body, (top, result.env)
+                else:
+                    result = Neutral(result, (top,))
+            else:
+                result = Neutral(result.head, result.args + (top,))
+
+    def force(self, thunk: Thunk) -> Union[Lam, Neutral]:
+        if thunk.value is None:
+            self.stack.append(Update(thunk))
+            self.eval(thunk.code, thunk.env)
+        return thunk.value
+
+    def compile(self, term: named.Term) -> Callable[[Optional[tuple]], Union[Lam, Neutral, tuple]]:
+        push = self.stack.append
+
+        def force(thunk: Thunk) -> Union[Lam, Neutral, tuple]:
+            if thunk.value is not None:
+                return thunk.value
+            push(Update(thunk))
+            return thunk.code, thunk.env
+
+        def index_code(index: int) -> Callable:
+            if index == 0:
+                return lambda env: force(env[0])
+            if index == 1:
+                return lambda env: force(env[1][0])
+
+            def lookup(env: tuple) -> Union[Lam, Neutral, tuple]:
+                for _ in range(index):
+                    env = env[1]
+                return force(env[0])
+            return lookup
+
+        def app_code(func: Callable, arg: Callable) -> Callable:
+            def app(env: Optional[tuple]) -> tuple:
+                push(Thunk(arg, env))
+                return func, env
+            return app
+
+        def lam_code(param: str, body: Callable) -> Callable:
+            return lambda env: Lam(param, body, env)
+
+        def free_code(name: str) -> Callable:
+            value = Neutral(name, ())
+            return lambda env: value
+
+        # params of the enclosing binders, innermost last
+        scope = []
+        codes = []
+        # (subterm, whether its parts are compiled)
+        stack = [(term, False)]
+        while stack:
+            term, done = stack.pop()
+            if done:
+                if isinstance(term, named.App):
+                    arg, func = codes.pop(), codes.pop()
+                    codes.append(app_code(func, arg))
+                else:
+                    scope.pop()
+                    codes.append(lam_code(term.param, codes.pop()))
+            elif isinstance(term, named.Var):
+                for i in range(len(scope) - 1, -1, -1):
+                    if scope[i] == term.name:
+                        codes.append(index_code(len(scope) - 1 - i))
+                        break
+                else:
+                    self.names.add(term.name)
+                    codes.append(free_code(term.name))
+            elif isinstance(term, named.App):
+                stack += ((term, True), (term.arg, False), (term.func, False))
+            else:
+                scope.append(term.param)
+                stack += ((term, True), (term.body, False))
+        return codes[0]
+
+    def fresh_param(self, hint: str) -> str:
+        # names must stay within the parser's [a-z_]+ alphabet
+        i = 0
+        while True:
+            param = hint + get_nth_lex_string(i)
+            if param not in self.names:
+                return param
+            i += 1
+
+    def read_back(self, value: Union[Lam, Neutral]) -> Term:
+        # a value to read back, a thunk to force and read back, a parameter
+        # whose abstraction is built over the last term read back, or APPLY
+        # to apply the term before it to it
+        results = []
+        tasks = [(READ, value)]
+        while tasks:
+            task, item = tasks.pop()
+            if task == FORCE:
+                task, item = READ, self.force(item)
+            if task == BIND:
+                self.names.discard(item)
+                results.append(Abs(item, results.pop()))
+            elif task == APPLY:
+                arg = results.pop()
+                results.append(App(results.pop(), arg))
+            elif type(item) is Lam:
+                param = self.fresh_param(item.param)
+                var = Thunk(None, None)
+                var.value = Neutral(param, ())
+                self.names.add(param)
+                tasks.append((BIND, param))
+                tasks.append((READ, self.eval(item.body, (var, item.env))))
+            else:
+                for arg in reversed(item.args):
+                    tasks.append((APPLY, None))
+                    tasks.append((FORCE, arg))
+                if type(item.head) is str:
+                    results.append(Var(item.head))
+                else:
+                    tasks.append((READ, item.head))
+        return results[0]
@@ -1,17 +1,23 @@
-from libc.stdint cimport uint32_t
-from libcpp.unordered_set cimport unordered_set
+from libc.stdint cimport uint32_t, uint64_t
+from libcpp.utility cimport pair
+from libcpp.vector cimport vector
 from libcpp.string cimport string as cpp_string
 
+# a free variable: its symbol, and its coefficient in the hash, see src/lc/alpha.py
+ctypedef pair[uint32_t, uint64_t] FreeVar
+
 cdef class Term:
-    cdef uint32_t _hash
     cdef Term nf
-    cdef public unordered_set[cpp_string] free_vars
+    # ordered by symbol
+    cdef vector[FreeVar] free_vars
+    cdef readonly uint64_t shape
+    cdef readonly uint64_t _hash
     cpdef Term subst(self, cpp_string var, Term value)
     cpdef Term reduce(self)
 
 
 cdef class Var(Term):
-    cdef public cpp_string name
+    cdef readonly uint32_t symbol
     cpdef Term subst(self, cpp_string var, Term value)
     cpdef Term reduce(self)
 
@@ -24,7 +30,18 @@ cdef class App(Term):
 
 
 cdef class Abs(Term):
-    cdef public cpp_string param
+    cdef readonly uint32_t symbol
     cdef public Term body
     cpdef Term subst(self, cpp_string var, Term value)
     cpdef Term reduce(self)
+
+
+cdef class TermCache:
+    cdef object entries
+    cdef public Py_ssize_t max_entries
+    cdef public Py_ssize_t hits
+    cdef public Py_ssize_t misses
+    cdef public Py_ssize_t evictions
+    cdef object get(self, tuple key)
+    cdef void put(self, tuple key, Term term)
+    cdef void shrink(self)
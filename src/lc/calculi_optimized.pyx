@@ -1,11 +1,612 @@
 from __future__ import annotations
 import re
-from ..common.utils import get_nth_lex_string, get_random_var_name
-from libcpp.unordered_set cimport unordered_set
+from ..common import symbols
+from ..common.utils import get_nth_lex_string
+from . import alpha
+from libc.stdint cimport uint32_t, uint64_t
 from libcpp.string cimport string as cpp_string
-from typing import Dict, Tuple
+from libcpp.vector cimport vector
+from cpython.ref cimport PyObject
+from collections import OrderedDict
+
+# Default bound of the hash-consing table, as a number of entries, not of
+# bytes: an entry is a single node, whose subterms are entries of their own,
+# so the bound is on nodes kept alive by the table, whatever the size of the
+# terms they head; -1 means unbounded
+DEFAULT_CACHE_ENTRIES = 1 << 20
+
+# Reduction counters, see src/lc/instrument.py. They only count while
+# `_instrumented` is set, so an event costs a single flag test otherwise;
+# hooks are called with (calculi, event, term) on top of the counting.
+cdef bint _instrumented = False
+cdef tuple _hooks = ()
+cdef Py_ssize_t _betas = 0
+cdef Py_ssize_t _substs = 0
+cdef Py_ssize_t _renames = 0
+cdef Py_ssize_t _nf_hits = 0
+cdef Py_ssize_t _cache_hits = 0
+cdef Py_ssize_t _cache_misses = 0
+
+
+def set_instrumentation(bint enabled, tuple hooks=()):
+    global _instrumented, _hooks
+    _instrumented = enabled
+    _hooks = hooks
+
+
+def instrumentation_counters() -> dict:
+    return {
+        "betas": _betas,
+        "substs": _substs,
+        "renames": _renames,
+        "nf_hits": _nf_hits,
+        "cache_hits": _cache_hits,
+        "cache_misses": _cache_misses,
+    }
+
+
+def reset_instrumentation():
+    global _betas, _substs, _renames, _nf_hits, _cache_hits, _cache_misses
+    _betas = _substs = _renames = _nf_hits = _cache_hits = _cache_misses = 0
+
+
+cdef _event(str event, object term):
+    cdef object hook
+    for hook in _hooks:
+        hook("Optimized", event, term)
+
+
+cdef class TermCache:
+    """Hash-consing table with least-recently-used eviction."""
+
+    def __init__(self, Py_ssize_t max_entries=DEFAULT_CACHE_ENTRIES):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    cdef object get(self, tuple key):
+        global _cache_hits, _cache_misses
+        t = self.entries.get(key)
+        if t is None:
+            self.misses += 1
+            if _instrumented:
+                _cache_misses += 1
+                if _hooks:
+                    _event("cache_miss", key)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            if _instrumented:
+                _cache_hits += 1
+                if _hooks:
+                    _event("cache_hit", t)
+        return t
+
+    cdef void put(self, tuple key, Term term):
+        self.entries[key] = term
+        self.shrink()
+
+    cdef void shrink(self):
+        if self.max_entries < 0:
+            return
+        while len(self.entries) > self.max_entries:
+            # evicted terms stay valid, they only stop being shared
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, Py_ssize_t max_entries):
+        self.max_entries = max_entries
+        self.shrink()
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+cdef TermCache _term_cache = TermCache()
+
+
+def configure_cache(Py_ssize_t max_entries=DEFAULT_CACHE_ENTRIES):
+    _term_cache.resize(max_entries)
+
+
+def cache_stats() -> dict:
+    return _term_cache.stats()
+
+
+def clear_cache():
+    _term_cache.clear()
+
+# Alpha-invariant hashing, see src/lc/alpha.py, whose constants these are.
+# Every value is below P, so a product of two fits in 64 bits.
+cdef uint64_t P = alpha.P
+cdef uint64_t K_APP = alpha.K_APP
+cdef uint64_t K_ABS = alpha.K_ABS
+cdef uint64_t BOUND = alpha.BOUND
+cdef uint64_t ABS_SHAPE = alpha.ABS_SHAPE
+cdef uint64_t ABS_COEFFICIENT = alpha.ABS_COEFFICIENT
+cdef uint64_t MIX = alpha.MIX
+cdef uint64_t FUNC_SALT = alpha.FUNC_SALT
+cdef uint64_t ARG_SALT = alpha.ARG_SALT
+
+
+cdef extern from "<functional>" namespace "std":
+    cdef cppclass string_hash "std::hash<std::string>":
+        size_t operator()(const cpp_string&)
+
+cdef string_hash _hasher
+
+# Terms keep symbols of the shared table, see src/common/symbols.py, in
+# place of names. By symbol: the name, for printing, and its hash.
+cdef vector[cpp_string] _names
+cdef vector[uint64_t] _name_hashes
+# symbols of the names renaming picks from, in order
+cdef vector[uint32_t] _renamed
+
+
+cdef uint32_t _symbol(str name):
+    cdef uint32_t symbol = symbols.intern(name)
+    cdef cpp_string known
+    while _names.size() <= symbol:
+        known = symbols.name(_names.size()).encode()
+        _names.push_back(known)
+        _name_hashes.push_back(_hasher(known) % P)
+    return symbol
+
+
+cdef Py_ssize_t _find(vector[FreeVar]& free_vars, uint32_t symbol):
+    # the index of `symbol` among free variables ordered by symbol, -1 when absent
+    cdef Py_ssize_t low = 0, high = free_vars.size(), middle
+    while low < high:
+        middle = (low + high) >> 1
+        if free_vars[middle].first < symbol:
+            low = middle + 1
+        else:
+            high = middle
+    if low < <Py_ssize_t>free_vars.size() and free_vars[low].first == symbol:
+        return low
+    return -1
+
+
+cdef inline bint _is_free(Term term, uint32_t symbol):
+    return _find(term.free_vars, symbol) != -1
+
+
+cdef uint32_t _fresh(Term body, Term value):
+    # the first name for renaming free in neither, see src/common/symbols.py
+    cdef size_t n = 0
+    while True:
+        while _renamed.size() <= n:
+            _renamed.push_back(_symbol(symbols.renamed(_renamed.size())))
+        if not _is_free(body, _renamed[n]) and not _is_free(value, _renamed[n]):
+            return _renamed[n]
+        n += 1
+
+
+cdef inline uint64_t _mix(uint64_t shape, uint64_t salt):
+    # a multiplier drawn from a shape, never 0
+    cdef uint64_t x = ((shape ^ salt) * MIX + 1) % P
+    return x if x else 1
+
+
+cdef void _hash_var(Var term):
+    term.shape = 0
+    term._hash = _name_hashes[term.symbol]
+    term.free_vars.push_back(FreeVar(term.symbol, 1))
+
+
+cdef void _hash_app(App term):
+    # merges the free variables of both sides, which are ordered by symbol,
+    # in one pass over both
+    cdef Term func = term.func, arg = term.arg
+    cdef uint64_t func_factor = _mix(arg.shape, FUNC_SALT)
+    cdef uint64_t arg_factor = _mix(func.shape, ARG_SALT)
+    cdef size_t i = 0, j = 0, n = func.free_vars.size(), m = arg.free_vars.size()
+    term.shape = (K_APP + func_factor * func.shape % P + arg_factor * arg.shape % P) % P
+    term._hash = (K_APP + func_factor * func._hash % P + arg_factor * arg._hash % P) % P
+    term.free_vars.reserve(n if n > m else m)
+    while i < n or j < m:
+        if j == m or (i < n and func.free_vars[i].first < arg.free_vars[j].first):
+            term.free_vars.push_back(FreeVar(func.free_vars[i].first, func_factor * func.free_vars[i].second % P))
+            i += 1
+        elif i == n or arg.free_vars[j].first < func.free_vars[i].first:
+            term.free_vars.push_back(FreeVar(arg.free_vars[j].first, arg_factor * arg.free_vars[j].second % P))
+            j += 1
+        else:
+            term.free_vars.push_back(FreeVar(func.free_vars[i].first, (func_factor * func.free_vars[i].second +
+                                                                       arg_factor * arg.free_vars[j].second) % P))
+            i += 1
+            j += 1
+
+
+cdef uint64_t _abs_shape(uint32_t symbol, Term body, uint64_t* hash_):
+    # the shape of \symbol. body, and its hash in `hash_`
+    cdef uint64_t coefficient = 0, bound_part = 0, shape
+    cdef Py_ssize_t found = _find(body.free_vars, symbol)
+    if found != -1:
+        coefficient = body.free_vars[found].second
+        bound_part = coefficient * _name_hashes[symbol] % P
+    shape = (K_ABS + ABS_SHAPE * ((body.shape + coefficient * BOUND) % P)) % P
+    hash_[0] = (shape + ABS_COEFFICIENT * ((body._hash + 2 * P - body.shape - bound_part) % P)) % P
+    return shape
+
+
+cdef void _hash_abs(Abs term):
+    cdef FreeVar entry
+    term.shape = _abs_shape(term.symbol, term.body, &term._hash)
+    term.free_vars.reserve(term.body.free_vars.size())
+    for entry in term.body.free_vars:
+        if entry.first != term.symbol:
+            term.free_vars.push_back(FreeVar(entry.first, ABS_COEFFICIENT * entry.second % P))
+
+
+# All traversals below run on an explicit stack, so term depth is bounded by
+# the heap rather than by the C stack. Each one mirrors the straightforward
+# recursive definition: descending pushes a continuation frame, and the
+# result of a subterm is handed back to the frame on top.
+
+# continuation frames
+cdef enum:
+    SUBST_ARG
+    BUILD_APP
+    BUILD_ABS
+    BUILD_RENAMED
+    RENAME
+    REDUCE_FUNC_DONE
+    REDUCE_ARG_DONE
+    MEMO_APP
+    MEMO_ABS
+
+
+# substitution frame: the subterm or partial result it refers to, if any
+cdef struct Frame:
+    int kind
+    PyObject* node
+
+
+# printing work item: a term to print, or a single character when `term` is NULL
+cdef struct Item:
+    PyObject* term
+    char token
+
+
+cdef Term _subst(Term term, uint32_t var, Term value):
+    # Frames point at subterms without owning them: the input tree, `value`
+    # and every renamed body (kept in `owned`) outlive the loop. Partial
+    # results and the state saved by a rename are owned by `owned`, and
+    # `var` and `value` only change across a RENAME frame.
+    cdef vector[Frame] frames
+    cdef Frame frame
+    cdef list owned = []
+    cdef Term result
+    cdef Abs abs_term
+    cdef bint var_free, captures
+    cdef str new_variable
+    cdef uint32_t new_symbol
+    global _substs, _renames
+    if _instrumented:
+        _substs += 1
+        if _hooks:
+            _event("subst", term)
+    while True:
+        # descend until the substitution of `term` is known
+        while True:
+            if type(term) is Var:
+                result = value if (<Var>term).symbol == var else term
+                break
+            if type(term) is App:
+                if not _is_free(term, var):
+                    # nothing to replace, and so nothing to rename either
+                    result = term
+                    break
+                if type((<App>term).func) is Var:
+                    # a variable in function position is substituted on the spot
+                    result = value if (<Var>(<App>term).func).symbol == var else (<App>term).func
+                    frames.push_back(Frame(BUILD_APP, <PyObject*>result))
+                    term = (<App>term).arg
+                    continue
+                frames.push_back(Frame(SUBST_ARG, <PyObject*>(<App>term).arg))
+                term = (<App>term).func
+                continue
+
+            abs_term = <Abs>term
+            if abs_term.symbol == var:
+                result = term
+                break
+            var_free = _is_free(abs_term.body, var)
+            captures = _is_free(value, abs_term.symbol)
+            if not var_free and not captures:
+                result = term
+                break
+            if not var_free or not captures:
+                frames.push_back(Frame(BUILD_ABS, <PyObject*>abs_term))
+                term = abs_term.body
+                continue
+
+            # rename the parameter first, then substitute into the renamed body
+            if _instrumented:
+                _renames += 1
+                if _hooks:
+                    _event("rename", abs_term)
+            new_symbol = _fresh(abs_term.body, value)
+            new_variable = symbols.name(new_symbol)
+            owned.append((new_symbol, var, value))
+            frames.push_back(Frame(RENAME, NULL))
+            var = abs_term.symbol
+            value = VarFact(new_variable)
+            term = abs_term.body
+
+        # hand the result back up until a frame needs another subterm
+        while not frames.empty():
+            frame = frames.back()
+            frames.pop_back()
+            if frame.kind == SUBST_ARG:
+                owned.append(result)
+                frames.push_back(Frame(BUILD_APP, NULL))
+                term = <Term>frame.node
+                break
+            elif frame.kind == BUILD_APP:
+                result = AppFact(owned.pop() if frame.node == NULL else <Term>frame.node, result)
+            elif frame.kind == BUILD_ABS:
+                result = _abs_fact((<Abs>frame.node).symbol, result)
+            elif frame.kind == BUILD_RENAMED:
+                owned.pop()
+                result = _abs_fact(owned.pop(), result)
+            else:
+                new_symbol, var, value = owned.pop()
+                owned.append(new_symbol)
+                owned.append(result)
+                frames.push_back(Frame(BUILD_RENAMED, NULL))
+                term = result
+                break
+        else:
+            return result
+
+
+cdef Term _reduce(Term term, Py_ssize_t fuel=-1):
+    # At most `fuel` redexes are contracted when it is not -1; a redex met
+    # past that is left as it is, and nothing is memoized from then on, as
+    # the results above it are no longer normal forms.
+    cdef bint exhausted = False
+    cdef vector[int] kinds
+    cdef list nodes = []
+    cdef object node
+    cdef int kind
+    cdef Term result
+    cdef Abs func
+    global _betas, _nf_hits
+    while True:
+        while True:
+            if term.nf is not None:
+                if _instrumented:
+                    _nf_hits += 1
+                    if _hooks:
+                        _event("nf_hit", term)
+                result = term.nf
+                break
+            if type(term) is App:
+                if type((<App>term).func) is Abs and not exhausted:
+                    if fuel == 0:
+                        exhausted = True
+                        result = term
+                        break
+                    fuel -= 1
+                    # the contractum is reduced right away and memoized
+                    if _instrumented:
+                        _betas += 1
+                        if _hooks:
+                            _event("beta", term)
+                    func = <Abs>(<App>term).func
+                    result = _subst(func.body, func.symbol, (<App>term).arg)
+                    if type((<App>term).arg) is Abs and _equal(result, term):
+                        # a redex that reproduces itself, like (\x. x x) \x. x x,
+                        # is left as it is, and so ends the normalization
+                        exhausted = True
+                        result = term
+                        break
+                    kinds.push_back(MEMO_APP)
+                    nodes.append(term)
+                    term = result
+                    continue
+                kinds.push_back(REDUCE_FUNC_DONE)
+                nodes.append(term)
+                term = (<App>term).func
+            elif type(term) is Abs:
+                kinds.push_back(MEMO_ABS)
+                nodes.append(term)
+                term = (<Abs>term).body
+            else:
+                result = term
+                break
+
+        while not kinds.empty():
+            kind = kinds.back()
+            kinds.pop_back()
+            node = nodes.pop()
+            if kind == MEMO_APP:
+                if not exhausted:
+                    (<App>node).nf = result
+            elif kind == MEMO_ABS:
+                if result is not (<Abs>node).body:
+                    result = _abs_fact((<Abs>node).symbol, result)
+                else:
+                    result = <Term>node
+                if not exhausted:
+                    (<Abs>node).nf = result
+            elif kind == REDUCE_FUNC_DONE:
+                if result is not (<App>node).func:
+                    result = AppFact(result, (<App>node).arg)
+                else:
+                    kinds.push_back(REDUCE_ARG_DONE)
+                    nodes.append(node)
+                    term = (<App>node).arg
+                    break
+            elif result is not (<App>node).arg:
+                result = AppFact((<App>node).func, result)
+            else:
+                result = <Term>node
+        else:
+            return result
+
+
+cdef Py_ssize_t _innermost(dict scope, uint32_t symbol):
+    # the level of the binder of `symbol`, 0 when it is free
+    cdef list levels = scope.get(symbol)
+    return levels[len(levels) - 1] if levels else 0
+
+
+cdef bint _bound_alike(vector[FreeVar]& free_vars, dict left_scope, dict right_scope):
+    cdef FreeVar entry
+    for entry in free_vars:
+        if _innermost(left_scope, entry.first) != _innermost(right_scope, entry.first):
+            return False
+    return True
+
+
+cdef bint _equal(Term left, object right):
+    # equality up to the names of parameters, mostly settled by the hashes, see
+    # src/lc/alpha.py. Pairs are pushed as two borrowed pointers, both trees
+    # outlive the loop; a NULL on top of a pair of abstractions closes their
+    # scopes once their bodies are compared.
+    cdef vector[PyObject*] stack
+    # symbol: levels of the enclosing binders of that name, innermost last
+    cdef dict left_scope = {}, right_scope = {}
+    cdef Py_ssize_t level = 0, a_level
+    cdef object a, b
+    if left is right:
+        return True
+    if type(left) is not type(right) or left._hash != (<Term>right)._hash:
+        return False
+    stack.push_back(<PyObject*>left)
+    stack.push_back(<PyObject*>right)
+    while not stack.empty():
+        if stack.back() == NULL:
+            stack.pop_back()
+            b = <object>stack.back()
+            stack.pop_back()
+            a = <object>stack.back()
+            stack.pop_back()
+            left_scope[(<Abs>a).symbol].pop()
+            right_scope[(<Abs>b).symbol].pop()
+            level -= 1
+            continue
+        b = <object>stack.back()
+        stack.pop_back()
+        a = <object>stack.back()
+        stack.pop_back()
+        if a is b and (level == 0 or _bound_alike((<Term>a).free_vars, left_scope, right_scope)):
+            # the same subterm matches itself if its free variables are bound
+            # alike on both sides
+            continue
+        if type(a) is not type(b) or (<Term>a).shape != (<Term>b).shape:
+            return False
+        if type(a) is App:
+            stack.push_back(<PyObject*>(<App>a).arg)
+            stack.push_back(<PyObject*>(<App>b).arg)
+            stack.push_back(<PyObject*>(<App>a).func)
+            stack.push_back(<PyObject*>(<App>b).func)
+        elif type(a) is Abs:
+            level += 1
+            left_scope.setdefault((<Abs>a).symbol, []).append(level)
+            right_scope.setdefault((<Abs>b).symbol, []).append(level)
+            stack.push_back(<PyObject*>a)
+            stack.push_back(<PyObject*>b)
+            stack.push_back(NULL)
+            stack.push_back(<PyObject*>(<Abs>a).body)
+            stack.push_back(<PyObject*>(<Abs>b).body)
+        else:
+            a_level = _innermost(left_scope, (<Var>a).symbol)
+            if a_level != _innermost(right_scope, (<Var>b).symbol) or (a_level == 0 and (<Var>a).symbol != (<Var>b).symbol):
+                return False
+    return True
+
+
+cdef str _to_str(Term term):
+    # a function is parenthesized when it is an abstraction or an application
+    # ending in one, an argument when it is an application, a body never
+    cdef vector[Item] stack
+    cdef cpp_string out
+    cdef Item item
+    cdef object t, func, arg
+    stack.push_back(Item(<PyObject*>term, 0))
+    while not stack.empty():
+        item = stack.back()
+        stack.pop_back()
+        if item.term == NULL:
+            out.push_back(item.token)
+            continue
+        t = <object>item.term
+        if type(t) is Var:
+            out.append(_names[(<Var>t).symbol])
+        elif type(t) is App:
+            func = (<App>t).func
+            arg = (<App>t).arg
+            if type(arg) is App:
+                stack.push_back(Item(NULL, c')'))
+                stack.push_back(Item(<PyObject*>arg, 0))
+                stack.push_back(Item(NULL, c'('))
+            else:
+                stack.push_back(Item(<PyObject*>arg, 0))
+            stack.push_back(Item(NULL, c' '))
+            if type(func) is Abs or (type(func) is App and type((<App>func).arg) is Abs):
+                stack.push_back(Item(NULL, c')'))
+                stack.push_back(Item(<PyObject*>func, 0))
+                stack.push_back(Item(NULL, c'('))
+            else:
+                stack.push_back(Item(<PyObject*>func, 0))
+        else:
+            out.push_back(c'\\')
+            out.append(_names[(<Abs>t).symbol])
+            out.append(b". ")
+            stack.push_back(Item(<PyObject*>(<Abs>t).body, 0))
+    return out.decode('utf-8')
+
+
+cdef str _to_repr(Term term):
+    cdef vector[Item] stack
+    cdef cpp_string out
+    cdef Item item
+    cdef object t
+    stack.push_back(Item(<PyObject*>term, 0))
+    while not stack.empty():
+        item = stack.back()
+        stack.pop_back()
+        if item.term == NULL:
+            out.push_back(item.token)
+            continue
+        t = <object>item.term
+        if type(t) is Var:
+            out.append(_names[(<Var>t).symbol])
+        elif type(t) is App:
+            out.push_back(c'(')
+            stack.push_back(Item(NULL, c')'))
+            stack.push_back(Item(<PyObject*>(<App>t).arg, 0))
+            stack.push_back(Item(NULL, c' '))
+            stack.push_back(Item(<PyObject*>(<App>t).func, 0))
+        else:
+            out.append(b"(\\")
+            out.append(_names[(<Abs>t).symbol])
+            out.append(b". ")
+            stack.push_back(Item(NULL, c')'))
+            stack.push_back(Item(<PyObject*>(<Abs>t).body, 0))
+    return out.decode('utf-8')
 
-_term_cache: Dict[Tuple, "Term"] = {}
 
 cdef class Term:
     def __init__(self):
@@ -21,16 +622,24 @@ cdef class Term:
     cpdef Term reduce(self):
         raise NotImplementedError("Subclasses must implement this method")
 
+    def step(self) -> tuple[Term, bool]:
+        # a single contraction, where reduce() runs to the normal form
+        cdef Term reduced = _reduce(self, 1)
+        return reduced, reduced is not self
+
     def normalize(self, int n_steps=-1) -> tuple[Term, int]:
+        # reduce() runs to the normal form at once; within a step budget,
+        # every step is a single contraction, so that the budget can stop
+        # a term that grows without end
         cdef Term term = self
         cdef Term prev = None
         cdef int i = 0
 
-        while term != prev:
+        while term is not prev:
             if -1 < n_steps == i:
                 break
             prev = term
-            term = term.reduce()
+            term = _reduce(term, 1) if n_steps > -1 else term.reduce()
             i += 1
 
         return term, i
@@ -39,13 +648,15 @@ cdef class Term:
 cdef class Var(Term):
     def __init__(self, str name):
         super().__init__()
-        self.name = cpp_string(name.encode())
-        self.free_vars = unordered_set[cpp_string]()
-        self.free_vars.insert(self.name)
-        self._hash = hash(("v", name))
+        self.symbol = _symbol(name)
+        _hash_var(self)
+
+    @property
+    def name(self) -> bytes:
+        return _names[self.symbol]
 
     cpdef Term subst(self, cpp_string var, Term value):
-        return value if self.name == var else self
+        return value if self.symbol == _symbol(var.decode('utf-8')) else self
 
     cpdef Term reduce(self):
         return self
@@ -54,13 +665,13 @@ cdef class Var(Term):
         return self._hash
 
     def __eq__(self, other):
-        return isinstance(other, Var) and self.name == (<Var>other).name
+        return _equal(self, other)
 
     def __str__(self) -> str:
-        return self.name.decode('utf-8')
+        return _names[self.symbol].decode('utf-8')
 
     def __repr__(self) -> str:
-        return self.name.decode('utf-8')
+        return _names[self.symbol].decode('utf-8')
 
 
 def VarFact(name: str) -> Var:
@@ -68,7 +679,7 @@ def VarFact(name: str) -> Var:
     t = _term_cache.get(key)
     if t is None:
         t = Var(name)
-        _term_cache[key] = t
+        _term_cache.put(key, t)
     return t
 
 
@@ -77,59 +688,25 @@ cdef class App(Term):
         super().__init__()
         self.func = func
         self.arg = arg
-        self._hash = hash(("a", func, arg))
-        self.free_vars = unordered_set[cpp_string]()
-
-        cdef cpp_string cpp_var
-        for cpp_var in func.free_vars:
-            self.free_vars.insert(cpp_var)
-        for cpp_var in arg.free_vars:
-            self.free_vars.insert(cpp_var)
+        _hash_app(self)
 
     cpdef Term subst(self, cpp_string var, Term value):
-        return AppFact(
-            self.func.subst(var, value),
-            self.arg.subst(var, value)
-        )
+        return _subst(self, _symbol(var.decode('utf-8')), value)
 
     cpdef Term reduce(self):
-        if self.nf is not None:
-            return self.nf
-
-        if isinstance(self.func, Abs):
-            self.nf = (<Abs>self.func).body.subst((<Abs>self.func).param, self.arg).reduce()
-            return self.nf
-
-        cdef Term reduced_func = self.func.reduce()
-        if reduced_func != self.func:
-            return AppFact(reduced_func, self.arg)
-
-        cdef Term reduced_arg = self.arg.reduce()
-        if reduced_arg != self.arg:
-            return AppFact(self.func, reduced_arg)
-
-        return self
+        return _reduce(self)
 
     def __hash__(self) -> int:
         return self._hash
 
     def __eq__(self, other):
-        return isinstance(other, App) and self.func == other.func and self.arg == other.arg
+        return _equal(self, other)
 
     def __str__(self) -> str:
-        cdef str func_str = f"({self.func})"
-        if (isinstance(self.func, App) and isinstance((<App>self.func).func, App) and
-            isinstance((<App>self.func).arg, App)) or isinstance(self.func, Var):
-            func_str = re.sub(r"^\((.*)\)$", r"\1", func_str)
-
-        cdef str arg_str = f"({self.arg})"
-        if isinstance(self.arg, Abs) or isinstance(self.arg, Var):
-            arg_str = re.sub(r"^\((.*)\)$", r"\1", arg_str)
-
-        return f"{func_str} {arg_str}"
+        return _to_str(self)
 
     def __repr__(self) -> str:
-        return f"({repr(self.func)} {repr(self.arg)})"
+        return _to_repr(self)
 
 
 def AppFact(f: Term, a: Term) -> App:
@@ -137,75 +714,59 @@ def AppFact(f: Term, a: Term) -> App:
     t = _term_cache.get(key)
     if t is None:
         t = App(f, a)
-        _term_cache[key] = t
+        _term_cache.put(key, t)
     return t
 
 
 cdef class Abs(Term):
     def __init__(self, str param, Term body):
         super().__init__()
-        self.param = cpp_string(param.encode())
+        self.symbol = _symbol(param)
         self.body = body
-        self._hash = hash(("l", param, body))
-        self.free_vars = unordered_set[cpp_string]()
+        _hash_abs(self)
 
-        cdef cpp_string cpp_var
-        for cpp_var in body.free_vars:
-            if cpp_var != self.param:
-                self.free_vars.insert(cpp_var)
+    @property
+    def param(self) -> bytes:
+        return _names[self.symbol]
 
     cpdef Term subst(self, cpp_string var, Term value):
-        if self.param == var:
-            return self
-        elif self.body.free_vars.count(var) == 0 and value.free_vars.count(self.param) == 0:
-            return self
-        elif self.body.free_vars.count(var) == 0 or value.free_vars.count(self.param) == 0:
-            return AbsFact(
-                self.param.decode('utf-8'),
-                self.body.subst(var, value)
-            )
-
-        cdef str new_variable = get_random_var_name()
-        cdef cpp_string cpp_new_variable = cpp_string(new_variable.encode())
-        cdef Term alpha_step = self.body.subst(self.param, VarFact(new_variable))
-        cdef Term subst_step = alpha_step.subst(var, value)
-        return AbsFact(
-            new_variable,
-            subst_step
-        )
+        return _subst(self, _symbol(var.decode('utf-8')), value)
 
     cpdef Term reduce(self):
-        if self.nf is not None:
-            return self.nf
-
-        body_nf = self.body.reduce()
-        if body_nf is self.body:
-            nf = self
-        else:
-            nf = AbsFact(self.param.decode('utf-8'), body_nf)
-        self.nf = nf
-        return nf
+        return _reduce(self)
 
     def __hash__(self) -> int:
         return self._hash
 
     def __eq__(self, other):
-        return isinstance(other, Abs) and self.body == other.body
+        return _equal(self, other)
 
     def __str__(self) -> str:
-        cdef str body_str = f"({self.body})"
-        if isinstance(self.body, (App, Abs)) or isinstance(self.body, Var):
-            body_str = re.sub(r"^\((.*)\)$", r"\1", body_str)
-        return f"\\{self.param.decode('utf-8')}. {body_str}"
+        return _to_str(self)
 
     def __repr__(self) -> str:
-        return f"(\\{self.param.decode('utf-8')}. {repr(self.body)})"
+        return _to_repr(self)
 
 
 def AbsFact(param: str, body: Term) -> Abs:
-    key = ("l", param, body)
+    return _abs_fact(_symbol(param), body)
+
+
+cdef Abs _abs_fact(uint32_t symbol, Term body):
+    # keyed by the alpha-invariant hash, so alpha-variants share one term,
+    # named after the parameter of whichever was built first
+    cdef uint64_t hash_
+    cdef Abs new
+    _abs_shape(symbol, body, &hash_)
+    key = ("l", hash_)
     t = _term_cache.get(key)
-    if t is None:
-        t = Abs(param, body)
-        _term_cache[key] = t
-    return t
+    if t is not None and (<Abs>t).body is body and (<Abs>t).symbol == symbol:
+        return t
+    new = Abs.__new__(Abs)
+    new.symbol = symbol
+    new.body = body
+    _hash_abs(new)
+    if t is not None and _equal(<Term>t, new):
+        return t
+    _term_cache.put(key, new)
+    return new
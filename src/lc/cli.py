@@ -1,10 +1,14 @@
+from __future__ import annotations
 import sys
-from pprint import pprint
+import json
+import time
+from typing import TYPE_CHECKING, Iterator, TextIO
 
-from src.common.benchmark import benchmark
-from src.lc.calculi_vanilla import Term
 from .parser import LambdaParser
 
+if TYPE_CHECKING:
+    from .backends import Term
+
 
 class CLI:
     def __init__(self, variables: dict[str, str]):
@@ -12,59 +16,169 @@ class CLI:
         self.trace = variables.get('trace', 'None')
         self.calculi = variables.get('calculi', 'Vanilla')
 
+        if self.calculi == 'Optimized' and 'cache_entries' in variables:
+            from .calculi_optimized import configure_cache
+            configure_cache(int(variables['cache_entries']))
+
     def run(self):
-        if 'I' in self.variables:
+        if 'batch' in self.variables:
+            self.run_batch_stream()
+        elif 'I' in self.variables and 'jobs' in self.variables:
+            self.run_batch_from_file()
+        elif 'I' in self.variables:
             self.run_from_file()
         else:
             self.run_from_stdin()
 
     def run_from_file(self):
+        from .printer import write
+
         with open(self.variables['I'], "r", encoding="utf-8") as input_file:
             program = input_file.read()
             lambda_parser = LambdaParser(program, calculi=self.calculi)
             parsed_term = lambda_parser.parse()
             normalized_term = self.normalize(parsed_term)
 
+            # written as it is printed; with --share, repeated subterms are
+            # written once as definitions
+            sharing = 'share' in self.variables
             if 'O' in self.variables:
                 with open(self.variables['O'], "w", encoding="utf-8") as output_file:
-                    output_file.write(str(normalized_term))
+                    write(normalized_term, output_file, sharing)
             else:
-                print(normalized_term)
+                write(normalized_term, sys.stdout, sharing)
+                print()
+
+    def run_batch_from_file(self):
+        # one term per line, normalized in parallel; the results come in the same order
+        from .pool import normalize_all
+
+        with open(self.variables['I'], "r", encoding="utf-8") as input_file:
+            programs = [line for line in input_file.read().splitlines() if line.strip()]
+        terms = [LambdaParser(program, calculi=self.calculi).parse() for program in programs]
+        timeout = float(self.variables['timeout']) if 'timeout' in self.variables else None
+        results = normalize_all(terms, self.calculi, jobs=int(self.variables['jobs']), timeout=timeout)
+
+        output = "\n".join("TIMEOUT" if result is None else
+                           f"ERROR {type(result).__name__}: {result}" if isinstance(result, Exception) else
+                           str(result[0]) for result in results)
+        if 'O' in self.variables:
+            with open(self.variables['O'], "w", encoding="utf-8") as output_file:
+                output_file.write(output)
+        else:
+            print(output)
+
+    def run_batch_stream(self):
+        # one item per line, either an expression or a JSON object with "expr"
+        # and optionally "id" and the limits of evaluate; every result is
+        # written as a JSON line as soon as it is known
+        input_file = open(self.variables['I'], "r", encoding="utf-8") if 'I' in self.variables else sys.stdin
+        output_file = open(self.variables['O'], "w", encoding="utf-8") if 'O' in self.variables else sys.stdout
+        try:
+            for response in self.evaluate_stream(input_file):
+                output_file.write(json.dumps(response) + "\n")
+                output_file.flush()
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+            if output_file is not sys.stdout:
+                output_file.close()
+
+    def evaluate_stream(self, lines: TextIO) -> Iterator[dict]:
+        from .evaluate import Evaluation, NORMAL, LIMITS
+
+        defaults = {name: float(self.variables[name]) if name == 'timeout' else int(self.variables[name])
+                    for name in LIMITS if name in self.variables}
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            response = {'id': number}
+            start = time.perf_counter()
+            try:
+                if line.lstrip().startswith('{'):
+                    item = json.loads(line)
+                    response['id'] = item.get('id', number)
+                    program = item['expr']
+                    if not isinstance(program, str):
+                        raise TypeError(f"expr must be a string, not {type(program).__name__}")
+                    limits = {name: item[name] for name in LIMITS if item.get(name) is not None}
+                    for name, value in limits.items():
+                        # the timeout may be fractional, the other limits are counts
+                        if type(value) not in ((int, float) if name == 'timeout' else (int,)):
+                            raise TypeError(f"{name} must be a number, not {type(value).__name__}")
+                    limits = {**defaults, **limits}
+                else:
+                    program, limits = line, defaults
+                term = LambdaParser(program, calculi=self.calculi).parse()
+                parsed = time.perf_counter()
+                if limits:
+                    evaluation = Evaluation(term, **limits)
+                    evaluation.run()
+                    normalized_term, n_steps, status = evaluation.term, evaluation.steps, evaluation.status
+                else:
+                    # unbounded, the calculi's own loop is the fastest
+                    (normalized_term, n_steps), status = term.normalize(), NORMAL
+                response.update(result=str(normalized_term), steps=n_steps, status=status)
+                response['time_ms'] = {'parse': (parsed - start) * 1000, 'eval': (time.perf_counter() - parsed) * 1000}
+            except (SyntaxError, ValueError, TypeError, KeyError, RecursionError) as err:
+                response['error'] = f"{type(err).__name__}: {err}"
+            yield response
 
     def run_from_stdin(self):
         while True:
             try:
                 program = input('> ')
+            except EOFError:
+                break
+            try:
                 lambda_parser = LambdaParser(program, calculi=self.calculi)
                 parsed_term = lambda_parser.parse()
 
                 print(self.normalize(parsed_term))
             except SyntaxError as err:
                 print(err)
-                break
 
     def normalize(self, term: Term) -> Term:
         if self.trace == 'None':
             normalized_term, _ = term.normalize()
             return normalized_term
 
-        if self.trace == 'Low':
-            stats = benchmark(term.normalize, measure_time=True)
-        elif self.trace == 'Mid':
-            stats = benchmark(term.normalize, measure_time=True, measure_tracemalloc=True, measure_profile=False, measure_allocs=True)
-        else:
-            stats = benchmark(term.normalize, measure_time=True, measure_tracemalloc=True, measure_profile=True, measure_allocs=True)
+        # the profiling tools are only imported when tracing
+        from pprint import pprint
+        from src.common.benchmark import benchmark
+        from . import instrument
+        instrument.reset(self.calculi)
+        instrument.enable(calculi=self.calculi)
+        size, depth = instrument.size_and_depth(term)
+        try:
+            if self.trace == 'Low':
+                stats = benchmark(term.normalize, measure_time=True)
+            elif self.trace == 'Mid':
+                stats = benchmark(term.normalize, measure_time=True, measure_tracemalloc=True, measure_profile=False, measure_allocs=True)
+            else:
+                stats = benchmark(term.normalize, measure_time=True, measure_tracemalloc=True, measure_profile=True, measure_allocs=True)
+        finally:
+            instrument.disable(self.calculi)
 
         normalized_term, n_steps = stats['result']
         del stats['result']
         stats['steps'] = n_steps
+        stats['reduction'] = instrument.stats(self.calculi)
+        # (before, after) normalization
+        normal_size, normal_depth = instrument.size_and_depth(normalized_term)
+        stats['reduction']['size'] = size, normal_size
+        stats['reduction']['depth'] = depth, normal_depth
+        if self.calculi == 'Optimized':
+            from .calculi_optimized import cache_stats
+            stats['term_cache'] = cache_stats()
         print("================================================")
         pprint(stats)
         print("================================================")
         return normalized_term
 
 if __name__ == '__main__':
-    variables = dict(map(lambda x: x.replace('-', '').split('='), sys.argv[1:]))
+    # a flag without a value, like --batch, is set to ''
+    variables = dict(map(lambda x: (x.replace('-', '').split('=') + [''])[:2], sys.argv[1:]))
 
     cli = CLI(variables)
     cli.run()
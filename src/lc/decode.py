@@ -0,0 +1,155 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from .printer import kind_of, VAR, APP, ABS, IDX, LIT
+from .serialize import name_of
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# Reads values back out of normal forms of any calculi, from the structure of
+# the terms instead of their printed text: Church numerals, booleans, pairs
+# and lists, encoded as in src/program.lc. A decoder walks the spine of its
+# encoding once, without recursion, and returns None for a term that is not
+# such an encoding. Variables are matched by the binder they refer to, not by
+# name, so any parameter names, shadowing ones included, decode alike, and so
+# do de Bruijn indices. The native literals of the Machine calculi are their
+# own values.
+#
+#     numeral   \s. \z. s (s (... z))       n
+#     boolean   \x. \y. x  /  \x. \y. y     True / False
+#     pair      \f. f a b                   (a, b)
+#     items     \c. \n. c a (c b (... n))   [a, b, ...]
+
+
+def binders(term: Term, n: int) -> Optional[tuple[list[str], Term]]:
+    """The params of the `n` abstractions `term` starts with, and the body
+    under them."""
+    params = []
+    for _ in range(n):
+        if kind_of(term) != ABS:
+            return None
+        params.append(name_of(term.param))
+        term = term.body
+    return params, term
+
+
+def binder_of(term: Term, params: list[str], debruijn: bool) -> Optional[int]:
+    """The position in `params` of the binder the variable `term` refers to,
+    None when it is not a variable bound by one of them."""
+    kind = kind_of(term)
+    if kind == IDX:
+        return len(params) - 1 - term.index if term.index < len(params) else None
+    if kind != VAR or debruijn:
+        # the named variables of a de Bruijn term are free
+        return None
+    name = name_of(term.name)
+    for i in range(len(params) - 1, -1, -1):
+        if params[i] == name:
+            return i
+    return None
+
+
+def independent(term: Term, params: list[str], debruijn: bool) -> bool:
+    """Whether `term`, under the abstractions over `params`, refers to none of
+    them, and so means the same outside of them."""
+    if debruijn:
+        return term.loose == 0
+    # name: abstractions over it met on the way down, which hide the binder
+    hidden = dict.fromkeys(params, 0)
+    # None closes the scope of the abstraction below it
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            hidden[name_of(stack.pop().param)] -= 1
+            continue
+        kind = kind_of(node)
+        if kind == VAR:
+            name = name_of(node.name)
+            if name in hidden and hidden[name] == 0:
+                return False
+        elif kind == APP:
+            stack.append(node.arg)
+            stack.append(node.func)
+        elif kind == ABS:
+            param = name_of(node.param)
+            if param in hidden:
+                hidden[param] += 1
+                stack.append(node)
+                stack.append(None)
+            stack.append(node.body)
+    return True
+
+
+def numeral(term: Term) -> Optional[int]:
+    """The number encoded by a Church numeral."""
+    if kind_of(term) == LIT:
+        return term.value if type(term.value) is int else None
+    head = binders(term, 2)
+    if head is None:
+        return None
+    params, body = head
+    debruijn = hasattr(term, 'loose')
+    n = 0
+    while kind_of(body) == APP:
+        if binder_of(body.func, params, debruijn) != 0:
+            return None
+        n += 1
+        body = body.arg
+    return n if binder_of(body, params, debruijn) == 1 else None
+
+
+def boolean(term: Term) -> Optional[bool]:
+    """The value of a Church boolean, TRUE choosing the first of two terms."""
+    if kind_of(term) == LIT:
+        return term.value if type(term.value) is bool else None
+    head = binders(term, 2)
+    if head is None:
+        return None
+    params, body = head
+    chosen = binder_of(body, params, hasattr(term, 'loose'))
+    return None if chosen is None else chosen == 0
+
+
+def pair(term: Term, decode: Callable[[Term], Any] = None) -> Optional[tuple]:
+    """The two components of a pair, each decoded by `decode` when given."""
+    head = binders(term, 1)
+    if head is None:
+        return None
+    params, body = head
+    debruijn = hasattr(term, 'loose')
+    if kind_of(body) != APP or kind_of(body.func) != APP or binder_of(body.func.func, params, debruijn) != 0:
+        return None
+    components = body.func.arg, body.arg
+    if not all(independent(component, params, debruijn) for component in components):
+        return None
+    if decode is not None:
+        components = tuple(decode(component) for component in components)
+        if None in components:
+            return None
+    return components
+
+
+def items(term: Term, decode: Callable[[Term], Any] = None) -> Optional[list]:
+    """The items of a list folded from the right, each decoded by `decode`
+    when given."""
+    head = binders(term, 2)
+    if head is None:
+        return None
+    params, body = head
+    debruijn = hasattr(term, 'loose')
+    result = []
+    while kind_of(body) == APP:
+        if kind_of(body.func) != APP or binder_of(body.func.func, params, debruijn) != 0:
+            return None
+        item = body.func.arg
+        if not independent(item, params, debruijn):
+            return None
+        if decode is not None:
+            item = decode(item)
+            if item is None:
+                return None
+        result.append(item)
+        body = body.arg
+    return result if binder_of(body, params, debruijn) == 1 else None
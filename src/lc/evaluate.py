@@ -0,0 +1,264 @@
+from __future__ import annotations
+import sys
+import time
+import resource
+import tracemalloc
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from .instrument import size_and_depth
+from .serialize import name_of
+from .typecheck import typeable
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# Normalization under a budget: fuel (reduction steps), a wall-clock
+# deadline, a cap on the size of the term, and a cap on the memory taken
+# since the evaluation started. Running out of any of them ends the
+# evaluation with the term reached so far and a status saying why, instead
+# of hanging. An evaluation can also be advanced a slice at a time, so a
+# scheduler can interleave many of them.
+#
+# The calculi that reduce one step at a time (Vanilla, Optimized, Lazy,
+# DeBruijn) are driven step by step here. Machine and NbE only take a step
+# budget, and are run a slice of steps at a time, the read back term of one
+# slice starting the next, with the limits checked in between. A new slice
+# loses what the machine had shared, so with no limit but fuel the whole
+# budget goes in a single slice, and slices otherwise double up to
+# MAX_SLICE steps.
+#
+# Deadline, size and memory are checked every CHECK_EVERY steps, where the
+# term is also hashed up to alpha-equivalence: reduction is deterministic,
+# so meeting a state again means the evaluation cycles and never ends. The
+# read back terms between slices are checked the same way. With a deadline,
+# a slice is also cut to the steps the previous ones ran at in the time left.
+# A term too deep for a calculi that still recurses somewhere ends the
+# evaluation as TOO_DEEP, apart from the cap on its size.
+#
+# A simply typed term always reaches its normal form, and stays simply typed
+# as it reduces (see src/lc/typecheck.py), so once the term is found to be
+# typed it is neither hashed for cycles nor searched for a redex that
+# reproduces itself when it stops changing. With no limit to check either,
+# the rest of the evaluation is left to the calculi's own normal-order loop,
+# which runs without stopping and counts steps its own way. The type is
+# looked for at the first check, so that evaluations shorter than that never
+# pay for it.
+
+NORMAL = 'normal'
+OUT_OF_FUEL = 'out_of_fuel'
+DEADLINE = 'deadline'
+TOO_LARGE = 'too_large'
+TOO_DEEP = 'too_deep'
+OUT_OF_MEMORY = 'out_of_memory'
+DIVERGED = 'diverged'
+
+CHECK_EVERY = 64
+MAX_SLICE = CHECK_EVERY << 10
+
+# keyword arguments of Evaluation that limit it
+LIMITS = ('fuel', 'timeout', 'max_size', 'max_bytes')
+
+
+def fingerprint(term: Term) -> int:
+    """A hash of `term` that does not depend on the names of parameters."""
+    scope = []
+    results = []
+    stack = [(term, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            if hasattr(node, 'func'):
+                arg, func = results.pop(), results.pop()
+                results.append(hash((func, arg)))
+            else:
+                scope.pop()
+                results.append(hash(('L', results.pop())))
+        elif hasattr(node, 'func'):
+            stack.extend(((node, True), (node.arg, False), (node.func, False)))
+        elif hasattr(node, 'body'):
+            scope.append(node.param)
+            stack.extend(((node, True), (node.body, False)))
+        elif hasattr(node, 'name'):
+            for i in range(len(scope) - 1, -1, -1):
+                if scope[i] == node.name:
+                    results.append(hash(('B', len(scope) - 1 - i)))
+                    break
+            else:
+                results.append(hash(('F', name_of(node.name))))
+        else:
+            # de Bruijn indices and literals
+            results.append(hash((type(node).__name__, getattr(node, 'index', None), getattr(node, 'value', None))))
+    return results[-1]
+
+
+def has_redex(term: Term) -> bool:
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        if hasattr(node, 'func'):
+            if hasattr(node.func, 'body'):
+                return True
+            stack.append(node.arg)
+            stack.append(node.func)
+        elif hasattr(node, 'body'):
+            stack.append(node.body)
+    return False
+
+
+def memory_bytes() -> int:
+    # traced memory when tracemalloc runs, else the current resident size,
+    # or the peak one where /proc is missing
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Evaluation:
+    """A resumable normalization of `term`. `status` stays None while it can
+    go on, then tells which limit ended it, or NORMAL. With `typecheck`
+    off, a simply typed term is guarded like any other."""
+
+    def __init__(self, term: Term, fuel: int = None, timeout: float = None,
+                 max_size: int = None, max_bytes: int = None, typecheck: bool = True):
+        self.term = term
+        self.steps = 0
+        self.status: Optional[str] = None
+        self.fuel = fuel
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        # memory in use before the evaluation, which the cap does not count
+        self.base_bytes = None if max_bytes is None else memory_bytes()
+        # steps of the next slice of Machine and NbE, and the steps per
+        # second the slices ran at so far, see run_slice
+        self.slice = CHECK_EVERY
+        self.rate = None
+        # Brent's cycle detection over the fingerprints taken at checks
+        self.saved = None
+        self.power = self.period = 1
+        # whether the term is known to be simply typed, None until looked for
+        self.typed: Optional[bool] = None if typecheck else False
+
+    def run(self, n_steps: int = None) -> Optional[str]:
+        """Advances by at most `n_steps` steps, all the remaining ones by
+        default, and returns the status."""
+        for _ in self.slices(n_steps):
+            pass
+        return self.status
+
+    def slices(self, n_steps: int = None) -> Iterator['Evaluation']:
+        """Yields the evaluation after every slice of `n_steps` steps, until it
+        ends or, when `n_steps` is None, after running it to the end."""
+        if not hasattr(self.term, 'step'):
+            while self.status is None:
+                self.run_slice(n_steps)
+                if n_steps is not None or self.status is not None:
+                    yield self
+            return
+
+        while self.status is None:
+            budget = n_steps
+            while self.status is None and budget != 0:
+                if self.fuel is not None and self.steps >= self.fuel:
+                    self.status = OUT_OF_FUEL
+                    break
+                try:
+                    term, changed = self.term.step()
+                except RecursionError:
+                    # the term got too deep for a recursive calculi
+                    self.status = TOO_DEEP
+                    break
+                if not changed:
+                    self.status = DIVERGED if not self.typed and has_redex(term) else NORMAL
+                    break
+                self.term = term
+                self.steps += 1
+                if budget is not None:
+                    budget -= 1
+                if self.steps % CHECK_EVERY == 0:
+                    self.check()
+                    if self.status is None and n_steps is None and self.typed and self.unlimited():
+                        self.run_typed()
+            if n_steps is not None or self.status is not None:
+                yield self
+
+    def unlimited(self) -> bool:
+        return self.fuel is None and self.deadline is None and self.max_size is None and self.max_bytes is None
+
+    def strongly_normalizing(self) -> bool:
+        if self.typed is None:
+            self.typed = typeable(self.term)
+        return self.typed
+
+    def run_slice(self, n_steps: int = None):
+        budget = -1 if self.fuel is None else self.fuel - self.steps
+        if self.deadline is not None or self.max_size is not None or self.max_bytes is not None:
+            budget = self.slice if budget == -1 else min(budget, self.slice)
+            self.slice = min(self.slice * 2, MAX_SLICE)
+            if self.deadline is not None and self.rate is not None:
+                left = self.deadline - time.monotonic()
+                budget = min(budget, max(int(self.rate * left), CHECK_EVERY))
+        if n_steps is not None:
+            budget = n_steps if budget == -1 else min(budget, n_steps)
+        start = time.monotonic()
+        try:
+            self.term, steps = self.term.normalize(n_steps=budget)
+        except RecursionError:
+            self.status = TOO_DEEP
+            return
+        elapsed = time.monotonic() - start
+        if elapsed > 0:
+            self.rate = steps / elapsed
+        self.steps += steps
+        if steps != budget:
+            self.status = NORMAL
+        elif self.steps == self.fuel:
+            self.status = OUT_OF_FUEL
+        else:
+            self.check()
+
+    def run_typed(self):
+        # Lazy's own normalize is call-by-need, so its normal-order one is taken
+        normalize = getattr(self.term, 'energetic_normalize', self.term.normalize)
+        try:
+            self.term, steps = normalize()
+        except RecursionError:
+            self.status = TOO_DEEP
+            return
+        self.steps += steps
+        self.status = NORMAL
+
+    def check_limits(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.status = DEADLINE
+        elif self.max_size is not None and size_and_depth(self.term)[0] > self.max_size:
+            self.status = TOO_LARGE
+        elif self.max_bytes is not None and memory_bytes() - self.base_bytes > self.max_bytes:
+            self.status = OUT_OF_MEMORY
+
+    def check(self):
+        self.check_limits()
+        if self.status is None and not self.strongly_normalizing():
+            state = fingerprint(self.term)
+            if state == self.saved:
+                self.status = DIVERGED
+            elif self.period == self.power:
+                self.saved = state
+                self.power *= 2
+                self.period = 1
+            else:
+                self.period += 1
+
+
+def evaluate(term: Term, fuel: int = None, timeout: float = None, max_size: int = None,
+             max_bytes: int = None, typecheck: bool = True) -> Evaluation:
+    """Normalizes `term` within the given limits; see Evaluation."""
+    evaluation = Evaluation(term, fuel=fuel, timeout=timeout, max_size=max_size, max_bytes=max_bytes,
+                            typecheck=typecheck)
+    evaluation.run()
+    return evaluation
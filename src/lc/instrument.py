@@ -0,0 +1,69 @@
+from typing import Optional
+
+from .backends import module, loaded
+
+# Reduction-level counters of the substitution calculi: beta steps,
+# substitutions, capture-avoiding renames, subterms skipped as already
+# normal, and, for Optimized, hits and misses of its hash-consing table.
+# Instrumentation is off by default, where each event point costs one flag
+# test. Hooks are callables taking (calculi, event, term), called on every
+# event while instrumentation is on, e.g. to log or to stop a run early.
+#
+# Switching it on or off, and resetting it, applies to the given calculi,
+# by default to those already loaded, so that tracing one calculi does not
+# import the others (see src/lc/backends.py).
+
+CALCULI = ('Vanilla', 'Optimized', 'Lazy')
+
+
+def instrumented(calculi: Optional[str]) -> list[str]:
+    if calculi is not None:
+        return [calculi] if calculi in CALCULI else []
+    return [name for name in loaded() if name in CALCULI]
+
+
+def enable(hooks: tuple = (), calculi: str = None):
+    for name in instrumented(calculi):
+        module(name).set_instrumentation(True, tuple(hooks))
+
+
+def disable(calculi: str = None):
+    for name in instrumented(calculi):
+        module(name).set_instrumentation(False)
+
+
+def reset(calculi: str = None):
+    for name in instrumented(calculi):
+        module(name).reset_instrumentation()
+
+
+def stats(calculi: str) -> dict:
+    """The counters of `calculi` since the last reset, or {} for a calculi
+    without instrumentation."""
+    if calculi not in CALCULI:
+        return {}
+    return module(calculi).instrumentation_counters()
+
+
+def size_and_depth(term) -> tuple[int, int]:
+    """The number of nodes of `term` counted as a tree, and its depth. Shared
+    subterms are measured once, so DAGs from Optimized cost their own size."""
+    measures = {}
+    stack = [(term, False)]
+    while stack:
+        node, done = stack.pop()
+        if id(node) in measures:
+            continue
+        if hasattr(node, 'func'):
+            children = (node.func, node.arg)
+        elif hasattr(node, 'body'):
+            children = (node.body,)
+        else:
+            children = ()
+        if not done and children:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        sizes = [measures[id(child)] for child in children]
+        measures[id(node)] = (1 + sum(size for size, _ in sizes), 1 + max((depth for _, depth in sizes), default=0))
+    return measures[id(term)]
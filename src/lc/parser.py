@@ -1,82 +1,123 @@
+from __future__ import annotations
 import re
-from typing import Union
-from .calculi_vanilla import Term, Var, App, Abs
-from .calculi_lazy import Term as TermLazy, Var as VarLazy, App as AppLazy, Abs as AbsLazy
-from .calculi_optimized import Term as TermOpt, VarFact, AppFact, AbsFact
-from ..common.tokenizer import Tokenizer
+from typing import TYPE_CHECKING
+
+from .backends import BACKENDS, module
+
+if TYPE_CHECKING:
+    from .backends import Term
 
 
 VARIABLES_REGEX = r"[a-z_]+"
-LC_REGEX = re.compile(rf"\s*(?:(\\)|(\.)|(\()|(\))|({VARIABLES_REGEX})|$)")
+NUMBERS_REGEX = r"[0-9]+"
+# names of let definitions, which also cover the names of the primitives
+MACROS_REGEX = r"[A-Z+\-*/\[\]&|~_<>=]+"
+
+# One token per match, its kind being the index of the group that matched.
+# Anything else is caught by the last group and reported by the parser.
+LAMBDA, DOT, OPEN, CLOSE, VARIABLE, NUMBER, MACRO, UNKNOWN = range(1, 9)
+SCANNER = re.compile(
+    rf"\s*(?:(\\)|(\.)|(\()|(\))|({VARIABLES_REGEX})|({NUMBERS_REGEX})|({MACROS_REGEX})|(\S))"
+)
 
 
 class LambdaParser:
-    def __init__(self, text: str, calculi: str = 'Vanilla'):
-        self.tok = Tokenizer(text, token_regex=LC_REGEX)
+    def __init__(self, text: str, calculi: str = 'Vanilla', primitives: bool = False, macros: dict = None):
+        # with `primitives`, numerals and the names in PRIMITIVES and CONSTANTS
+        # are parsed as native constants and operators
+        if calculi not in BACKENDS:
+            raise ValueError(f"Unknown calculi {calculi}")
+        if primitives and calculi != 'Machine':
+            raise ValueError(f"Native primitives are not supported by the {calculi} calculi")
+        self.text = text
         self.calculi = calculi
+        self.primitives = primitives
+        # with `macros`, a name bound there stands for its already parsed term,
+        # which is linked by reference rather than copied
+        self.macros = macros
+        self.used_macros: set[str] = set()
 
-    def parse(self) -> Union[Term, TermOpt, TermLazy]:
-        term = self.parse_term()
-        if self.tok.peek() is not None and self.tok.peek() != "":
-            raise SyntaxError(f"Unexpected token: {self.tok.peek()}")
-        return term
-
-    def parse_term(self) -> Union[Term, TermOpt, TermLazy]:
-        if self.tok.peek() == "\\":
-            return self.parse_abs()
-        else:
-            return self.parse_app()
+    def parse(self) -> Term:
+        # A single pass over the tokens, without recursion. Every open
+        # parenthesis and every binder is a frame [kind, param, term] on the
+        # stack, `term` being the application built so far inside of it; a
+        # binder's body extends to the closing parenthesis or the end of input.
+        Var, App, Abs = BACKENDS[self.calculi]
+        # A calculi with de Bruijn indices gets them from the parser, which
+        # knows the binder of every variable as it reads it, and builds its
+        # abstractions over bodies that already use them: no binder walks its
+        # body again. `binders` holds the params of the open binders, and
+        # `scope` maps a name to the depths of the open binders of it.
+        binders, scope = [], None
+        calculi_module = module(self.calculi)
+        Idx = getattr(calculi_module, 'Idx', None)
+        if Idx is not None:
+            Abs = calculi_module.Abs
+            scope = {}
+        macros, primitives = self.macros, self.primitives
+        if primitives:
+            from .calculi_machine import Lit as LitMachine, PRIMITIVES, CONSTANTS
+        frame = [OPEN, None, None]
+        stack = [frame]
+        tokens = SCANNER.finditer(self.text)
+        for match in tokens:
+            kind = match.lastindex
+            tok = match.group(kind)
+            if kind == VARIABLE:
+                depths = scope.get(tok) if scope is not None else None
+                term = Idx(len(binders) - depths[-1]) if depths else Var(tok)
+            elif kind == LAMBDA:
+                param = next(tokens, None)
+                if param is None or param.lastindex != VARIABLE:
+                    raise SyntaxError(f"Expected variable after \\, got {param and param.group(param.lastindex)}")
+                dot = next(tokens, None)
+                if dot is None or dot.lastindex != DOT:
+                    raise SyntaxError(f"Expected '.', got {dot and dot.group(dot.lastindex)}")
+                frame = [LAMBDA, param.group(VARIABLE), None]
+                stack.append(frame)
+                if scope is not None:
+                    binders.append(frame[1])
+                    scope.setdefault(frame[1], []).append(len(binders))
+                continue
+            elif kind == OPEN:
+                frame = [OPEN, None, None]
+                stack.append(frame)
+                continue
+            elif kind == CLOSE:
+                term = self.close(stack, Abs, App, binders, scope)
+                if not stack:
+                    raise SyntaxError(f"Unexpected token: {tok}")
+                frame = stack[-1]
+            elif kind == MACRO and macros is not None and tok in macros:
+                self.used_macros.add(tok)
+                term = macros[tok]
+            elif kind == NUMBER and primitives:
+                term = LitMachine(int(tok))
+            elif kind == MACRO and primitives and tok in CONSTANTS:
+                term = LitMachine(CONSTANTS[tok])
+            elif kind == MACRO and primitives and tok in PRIMITIVES:
+                term = Var(tok)
+            else:
+                raise SyntaxError(f"Unexpected token: {tok}")
+            frame[2] = term if frame[2] is None else App(frame[2], term)
 
-    def parse_abs(self) -> Union[Term, TermOpt, TermLazy]:
-        self.tok.next()
-        param = self.tok.next()
-        if not re.match(VARIABLES_REGEX, param or ""):
-            raise SyntaxError(f"Expected variable after \\, got {param}")
-        dot = self.tok.next()
-        if dot != ".":
-            raise SyntaxError(f"Expected '.', got {dot}")
-        body = self.parse_term()
-        if self.calculi == 'Vanilla':
-            return Abs(param, body)
-        elif self.calculi == 'Lazy':
-            return AbsLazy(param, body)
-        else:
-            return AbsFact(param, body)
+        term = self.close(stack, Abs, App, binders, scope)
+        if stack:
+            raise SyntaxError("Expected ')'")
+        return term
 
-    def parse_app(self) -> Union[Term, TermOpt, TermLazy]:
-        left = self.parse_atom()
+    @staticmethod
+    def close(stack: list, Abs, App, binders: list, scope: dict = None) -> Term:
+        # pops the binders up to and including the innermost parenthesis
+        term = None
         while True:
-            nxt = self.tok.peek()
-            if nxt is None or nxt in (")", "."):
-                break
-
-            if nxt == "\\":
-                right = self.parse_abs()
-            else:
-                right = self.parse_atom()
-            if self.calculi == 'Vanilla':
-                left = App(left, right)
-            elif self.calculi == 'Lazy':
-                left = AppLazy(left, right)
-            else:
-                left = AppFact(left, right)
-        return left
-
-    def parse_atom(self) -> Union[Term, TermOpt, TermLazy]:
-        tok = self.tok.peek()
-        if tok == "(":
-            self.tok.next()
-            term = self.parse_term()
-            if self.tok.next() != ")":
-                raise SyntaxError("Expected ')'")
-            return term
-        elif re.match(VARIABLES_REGEX, tok or ""):
-            self.tok.next()
-            if self.calculi == 'Vanilla':
-                return Var(tok)
-            elif self.calculi == 'Lazy':
-                return VarLazy(tok)
-            else:
-                return VarFact(tok)
-        else:
-            raise SyntaxError(f"Unexpected token: {tok}")
+            kind, param, body = stack.pop()
+            if term is not None:
+                body = term if body is None else App(body, term)
+            if body is None:
+                raise SyntaxError("Expected a term")
+            if kind == OPEN:
+                return body
+            if scope is not None:
+                scope[binders.pop()].pop()
+            term = Abs(param, body)
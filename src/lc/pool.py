@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os
+import atexit
+import time
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from typing import TYPE_CHECKING, Callable, Union
+
+from .serialize import dumps, loads
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# Normalization of independent terms on several processes. Each worker runs
+# one task at a time, so a task that outlives its timeout is stopped by
+# killing its worker and starting a fresh one, whatever the calculi does in
+# the meantime. A task that fails, or whose worker dies, gets its error as
+# its result, and the others go on. Terms travel as serialize payloads both
+# ways: a prelude shared by the terms is written once per term, not once
+# per use. The workers of a calculi are kept between calls, so a caller
+# normalizing batch after batch starts them only once.
+
+
+def work(conn: Connection, calculi: str):
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        try:
+            term, n_steps = loads(task, calculi).normalize()
+            conn.send((dumps(term), n_steps))
+        except Exception as err:
+            conn.send(err)
+
+
+class Worker:
+    def __init__(self, *args, target: Callable = work):
+        # `target` serves the tasks sent on its end of the pipe, given `args`
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=target, args=(child_conn, *args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # index of the task being run, and when it times out
+        self.index = None
+        self.deadline = None
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class Pool:
+    """The workers of one calculi, kept between calls of normalize_all."""
+
+    def __init__(self, calculi: str):
+        self.calculi = calculi
+        self.workers: list[Worker] = []
+
+    def grow(self, jobs: int):
+        while len(self.workers) < jobs:
+            self.workers.append(Worker(self.calculi))
+
+    def replace(self, position: int):
+        self.workers[position].stop()
+        self.workers[position] = Worker(self.calculi)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+
+# calculi: its pool
+_pools: dict[str, Pool] = {}
+
+
+@atexit.register
+def stop_pools():
+    for pool in _pools.values():
+        pool.stop()
+    _pools.clear()
+
+
+def normalize_all(terms: list[Term], calculi: str, jobs: int = None,
+                  timeout: float = None) -> list[Union[tuple[Term, int], Exception, None]]:
+    """Normalizes every term, each as a separate task, and returns the
+    results in the order of `terms`: the normal form and the number of
+    steps, the error a task failed with, or None for a task that ran out of
+    `timeout` seconds."""
+    results = [None] * len(terms)
+    if not terms:
+        return results
+    pending = deque(range(len(terms)))
+    jobs = max(min(jobs or os.cpu_count(), len(terms)), 1)
+    pool = _pools.get(calculi)
+    if pool is None:
+        pool = _pools[calculi] = Pool(calculi)
+    pool.grow(jobs)
+    workers = pool.workers
+    try:
+        while True:
+            for worker in workers[:jobs]:
+                if worker.index is None and pending:
+                    worker.index = pending.popleft()
+                    worker.deadline = None if timeout is None else time.monotonic() + timeout
+                    worker.conn.send(dumps(terms[worker.index]))
+            busy = {worker.conn: position for position, worker in enumerate(workers[:jobs])
+                    if worker.index is not None}
+            if not busy:
+                return results
+
+            deadlines = [workers[position].deadline for position in busy.values()
+                         if workers[position].deadline is not None]
+            wait_sec = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            for conn in wait(list(busy), timeout=wait_sec):
+                position = busy[conn]
+                worker = workers[position]
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    pool.replace(position)
+                    results[worker.index] = ChildProcessError(f"Worker exited with code {worker.process.exitcode}")
+                    continue
+                if isinstance(result, Exception):
+                    results[worker.index] = result
+                else:
+                    payload, n_steps = result
+                    results[worker.index] = loads(payload, calculi), n_steps
+                worker.index = None
+
+            now = time.monotonic()
+            for position, worker in enumerate(workers[:jobs]):
+                if worker.index is not None and worker.deadline is not None and worker.deadline <= now:
+                    pool.replace(position)
+    except BaseException:
+        # the workers may still be busy with tasks of this call
+        pool.stop()
+        del _pools[calculi]
+        raise
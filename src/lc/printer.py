@@ -0,0 +1,227 @@
+from __future__ import annotations
+import io
+import string
+from typing import TYPE_CHECKING, Callable, Optional, TextIO
+
+from src.common.symbols import NO_FREE_VARS, singleton, union, without
+from src.common.utils import get_nth_lex_string
+from .serialize import name_of
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# Prints terms of any calculi in one pass over an explicit stack, writing
+# tokens to a text stream as it goes, so printing takes time and memory
+# linear in the output whatever the depth of the term.
+#
+# Parentheses are the fewest the parser needs: a function is parenthesized
+# when it is an abstraction or an application ending in one, an argument
+# when it is an application, a body never.
+#
+# With `sharing`, a subterm met more than once is written once, as a
+# definition `NAME := term;` of the syntax of .lc programs, and by its name
+# everywhere else, so a normal form that is a DAG of a few distinct subterms
+# is written in the size of the DAG instead of that of the tree it unfolds
+# to. Subterms are told apart up to the names of parameters, by their hash
+# and equality. Only subterms of at least MIN_SHARED_SIZE nodes are named,
+# and only those none of whose free variables is a parameter anywhere in the
+# term, so that a name stands for the same term wherever it is used. The
+# output is read back by src.lc_macro.parser.LambdaLetParser.
+
+VAR, APP, ABS, IDX, LIT = range(5)
+
+# the term classes of every calculi go by the same names
+KIND_NAMES = {'Var': VAR, 'App': APP, 'Abs': ABS, 'Idx': IDX, 'Lit': LIT}
+# term class: kind, filled as classes are met
+KINDS = {}
+
+MIN_SHARED_SIZE = 8
+# tokens kept before they are written out
+CHUNK = 4096
+
+
+def kind_of(term: Term) -> int:
+    kind = KINDS.get(type(term))
+    if kind is None:
+        kind = KINDS[type(term)] = KIND_NAMES[type(term).__name__]
+    return kind
+
+
+def to_string(term: Term, sharing: bool = False) -> str:
+    out = io.StringIO()
+    write(term, out, sharing)
+    return out.getvalue()
+
+
+def write(term: Term, stream: TextIO, sharing: bool = False):
+    # the names a de Bruijn parameter must not take
+    free = term.free_names() if hasattr(term, 'loose') else NO_FREE_VARS
+    out = []
+
+    def emit(token: str):
+        out.append(token)
+        if len(out) >= CHUNK:
+            stream.write("".join(out))
+            out.clear()
+
+    if sharing:
+        definitions, names = share(term)
+        for definition in definitions:
+            emit(f"{names[id(definition)]} := ")
+            emit_term(definition, emit, free, names)
+            emit(";\n")
+        emit_term(term, emit, free, names)
+    else:
+        emit_term(term, emit, free, None)
+    stream.write("".join(out))
+
+
+def emit_term(term: Term, emit: Callable[[str], None], free: frozenset, names: Optional[dict[int, str]]):
+    """Emits the tokens of `term`, its subterms in `names` (by id) by name."""
+    # params of the enclosing abstractions, innermost last, for de Bruijn indices
+    params = []
+    # strings are emitted as they are, None closes the scope of an abstraction
+    stack = [term]
+    pop, push = stack.pop, stack.append
+
+    def atomic(child: Term, kind: int) -> bool:
+        return kind in (VAR, IDX, LIT) or (names is not None and id(child) in names)
+
+    while stack:
+        item = pop()
+        if item is None:
+            params.pop()
+            continue
+        if type(item) is str:
+            emit(item)
+            continue
+        if names is not None and item is not term and id(item) in names:
+            emit(names[id(item)])
+            continue
+        kind = kind_of(item)
+        if kind == VAR:
+            emit(name_of(item.name))
+        elif kind == APP:
+            func, arg = item.func, item.arg
+            arg_kind = kind_of(arg)
+            if arg_kind == APP and not atomic(arg, arg_kind):
+                stack += (")", arg, "(", " ")
+            else:
+                push(arg)
+                push(" ")
+            func_kind = kind_of(func)
+            if not atomic(func, func_kind) and (func_kind == ABS or (
+                    func_kind == APP and kind_of(func.arg) == ABS and not atomic(func.arg, ABS))):
+                stack += (")", func, "(")
+            else:
+                push(func)
+        elif kind == ABS:
+            if hasattr(item, 'fresh_param'):
+                param = item.fresh_param(params, free)
+                params.append(param)
+                push(None)
+            else:
+                param = name_of(item.param)
+            push(item.body)
+            emit(f"\\{param}. ")
+        elif kind == IDX:
+            emit(params[-1 - item.index] if item.index < len(params) else f"#{item.index}")
+        else:
+            emit(str(item))
+
+
+def share(term: Term) -> tuple[list, dict[int, str]]:
+    """The subterms to define, each after those it uses, and the name of
+    every node standing for one of them, by id."""
+    debruijn = hasattr(term, 'loose')
+    # id: (size up to MIN_SHARED_SIZE, free variables), bottom-up over the DAG
+    facts = {}
+    params = set()
+    stack = [term]
+    while stack:
+        node = stack[-1]
+        if id(node) in facts:
+            stack.pop()
+            continue
+        kind = kind_of(node)
+        if kind == APP:
+            func, arg = facts.get(id(node.func)), facts.get(id(node.arg))
+            if func is None or arg is None:
+                stack.append(node.func)
+                stack.append(node.arg)
+                continue
+            facts[id(node)] = min(1 + func[0] + arg[0], MIN_SHARED_SIZE), union(func[1], arg[1])
+        elif kind == ABS:
+            body = facts.get(id(node.body))
+            if body is None:
+                stack.append(node.body)
+                continue
+            if debruijn:
+                # parameters are hints, bound variables are indices
+                facts[id(node)] = min(1 + body[0], MIN_SHARED_SIZE), body[1]
+            else:
+                param = name_of(node.param)
+                params.add(param)
+                facts[id(node)] = min(1 + body[0], MIN_SHARED_SIZE), without(body[1], param)
+        elif kind == VAR:
+            facts[id(node)] = 1, singleton(name_of(node.name))
+        else:
+            facts[id(node)] = 1, NO_FREE_VARS
+        stack.pop()
+
+    def candidate(node: Term) -> bool:
+        size, free_vars = facts[id(node)]
+        if size < MIN_SHARED_SIZE:
+            return False
+        if debruijn:
+            return node.loose == 0
+        return free_vars.isdisjoint(params)
+
+    # id: the first of its class met, for candidates; the subterms of a class
+    # are walked on its first occurrence only, which is all that is written
+    # of them once it is named
+    first = {}
+    classes = {}
+    occurrences = {}
+    # candidates in the order their first occurrence is done with
+    done = []
+    stack = [(term, False)]
+    while stack:
+        node, finished = stack.pop()
+        if finished:
+            done.append(node)
+            continue
+        if candidate(node):
+            representative = first.get(id(node))
+            if representative is None:
+                representative = first[id(node)] = classes.setdefault(node, node)
+            if id(representative) in occurrences:
+                occurrences[id(representative)] += 1
+                continue
+            occurrences[id(representative)] = 1
+            stack.append((representative, True))
+        kind = kind_of(node)
+        if kind == APP:
+            stack.append((node.arg, False))
+            stack.append((node.func, False))
+        elif kind == ABS:
+            stack.append((node.body, False))
+
+    taken = facts[id(term)][1]
+    definitions = []
+    names = {}
+    i = 1
+    for representative in done:
+        if occurrences[id(representative)] < 2:
+            continue
+        while True:
+            name = "S" + get_nth_lex_string(i, string.ascii_uppercase)
+            i += 1
+            if name not in taken:
+                break
+        definitions.append(representative)
+        names[id(representative)] = name
+    for node_id, representative in first.items():
+        if id(representative) in names:
+            names[node_id] = names[id(representative)]
+    return definitions, names
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import struct
+from typing import TYPE_CHECKING, Union
+
+from .backends import module
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# A compact binary form of terms of any calculi, to pass them between
+# processes and keep them on disk. A term is written as a DAG: subterms
+# shared by identity or by structure are written once, and nothing recurses,
+# so neither sharing nor depth is a problem. Terms are read back through the
+# calculi's own constructors, which for Optimized means through its
+# hash-consing table.
+#
+# payload: names, then nodes, children before parents, the root last
+# node:    tag, then two operands, indices of names or of earlier nodes
+
+COUNT = struct.Struct('<I')
+NAME = struct.Struct('<H')
+NODE = struct.Struct('<BII')
+
+VAR, APP, ABS, IDX, INT, BOOL = range(6)
+
+# calculi: names of the Var, App and Abs building nodes back, when not these
+BUILDERS = {'Optimized': ('VarFact', 'AppFact', 'AbsFact')}
+DEFAULT_BUILDERS = ('Var', 'App', 'Abs')
+
+# the term classes of every calculi go by the same names; literals are
+# integers or booleans, told apart by their value
+TAG_NAMES = {'Var': VAR, 'App': APP, 'Abs': ABS, 'Idx': IDX, 'Lit': INT}
+# term class: tag, filled as classes are met
+TAGS = {}
+
+
+def name_of(name: Union[str, bytes]) -> str:
+    # the Cython calculi keep names as bytes
+    return name.decode() if type(name) is bytes else name
+
+
+def dumps(term: Term) -> bytes:
+    names = {}
+    nodes = {}
+    ids = {}
+    stack = [(term, False)]
+    while stack:
+        node, done = stack.pop()
+        if id(node) in ids:
+            continue
+        tag = TAGS.get(type(node))
+        if tag is None:
+            tag = TAGS[type(node)] = TAG_NAMES[type(node).__name__]
+        if not done and tag == APP:
+            stack.append((node, True))
+            stack.append((node.arg, False))
+            stack.append((node.func, False))
+            continue
+        if not done and tag == ABS:
+            stack.append((node, True))
+            stack.append((node.body, False))
+            continue
+
+        if tag == VAR:
+            record = VAR, names.setdefault(name_of(node.name), len(names)), 0
+        elif tag == APP:
+            record = APP, ids[id(node.func)], ids[id(node.arg)]
+        elif tag == ABS:
+            record = ABS, names.setdefault(name_of(node.param), len(names)), ids[id(node.body)]
+        elif tag == IDX:
+            record = IDX, node.index, 0
+        elif type(node.value) is bool:
+            record = BOOL, int(node.value), 0
+        else:
+            record = INT, names.setdefault(str(node.value), len(names)), 0
+        ids[id(node)] = nodes.setdefault(record, len(nodes))
+
+    out = [COUNT.pack(len(names))]
+    for name in names:
+        encoded = name.encode()
+        out.append(NAME.pack(len(encoded)) + encoded)
+    out.append(COUNT.pack(len(nodes)))
+    out.extend(NODE.pack(*record) for record in nodes)
+    return b''.join(out)
+
+
+def loads(payload: bytes, calculi: str) -> Term:
+    calculi_module = module(calculi)
+    Var, App, Abs = (getattr(calculi_module, name) for name in BUILDERS.get(calculi, DEFAULT_BUILDERS))
+    (n_names,), offset = COUNT.unpack_from(payload, 0), COUNT.size
+    names = []
+    for _ in range(n_names):
+        (length,), offset = NAME.unpack_from(payload, offset), offset + NAME.size
+        names.append(bytes(payload[offset:offset + length]).decode())
+        offset += length
+    (n_nodes,), offset = COUNT.unpack_from(payload, offset), offset + COUNT.size
+
+    terms = []
+    for tag, a, b in NODE.iter_unpack(payload[offset:offset + n_nodes * NODE.size]):
+        if tag == VAR:
+            terms.append(Var(names[a]))
+        elif tag == APP:
+            terms.append(App(terms[a], terms[b]))
+        elif tag == ABS:
+            terms.append(Abs(names[a], terms[b]))
+        elif tag == IDX:
+            terms.append(module('DeBruijn').Idx(a))
+        elif tag == BOOL:
+            terms.append(module('Machine').Lit(bool(a)))
+        else:
+            terms.append(module('Machine').Lit(int(names[a])))
+    return terms[-1]
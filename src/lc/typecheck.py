@@ -0,0 +1,281 @@
+from __future__ import annotations
+import string
+from typing import TYPE_CHECKING, Optional
+
+from src.common.symbols import NO_FREE_VARS, singleton, union, without
+from src.common.utils import get_nth_lex_string
+from .printer import kind_of, VAR, APP, ABS, IDX
+from .serialize import name_of
+
+if TYPE_CHECKING:
+    from .backends import Term
+
+# Type inference for the simply typed fragment, over the terms of any
+# calculi. A simply typed term is strongly normalizing: every reduction
+# order ends, so its evaluation needs no guard against divergence and no
+# step budget, and may take whichever strategy is fastest.
+#
+# Inference is unification over a graph of types: every node is a type
+# variable, a base type (Int and Bool, of the Machine literals) or an arrow,
+# and unified nodes are merged in a union-find. Unification does no occurs
+# check; a type that contains itself shows up as a cycle in the graph, which
+# is looked for once at the end, in one pass over all the nodes.
+#
+# Free variables are constants of a type of their own, the same for every
+# occurrence. A closed subterm the term shares, like a definition of a .lc
+# program linked in at each use, is inferred once and its type generalized,
+# as Hindley-Milner does for let, so each occurrence gets a fresh copy: the
+# term is typed as if every occurrence were a copy, which is what reduction
+# sees, in time proportional to the shared term.
+
+INT = 'Int'
+BOOL = 'Bool'
+
+
+class Types:
+    """The type graph: node i is `shapes[i]`, None for a variable, the name
+    of a base type, or an arrow (domain, codomain), unless it has been
+    unified into `parents[i]`."""
+
+    def __init__(self):
+        self.parents: list[int] = []
+        self.shapes: list = []
+
+    def new(self, shape=None) -> int:
+        self.parents.append(len(self.parents))
+        self.shapes.append(shape)
+        return len(self.parents) - 1
+
+    def find(self, node: int) -> int:
+        parents = self.parents
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    def unify(self, left: int, right: int) -> bool:
+        shapes = self.shapes
+        stack = [(left, right)]
+        while stack:
+            left, right = stack.pop()
+            left, right = self.find(left), self.find(right)
+            if left == right:
+                continue
+            left_shape, right_shape = shapes[left], shapes[right]
+            if left_shape is None:
+                self.parents[left] = right
+            elif right_shape is None:
+                self.parents[right] = left
+            elif type(left_shape) is tuple and type(right_shape) is tuple:
+                # merged first, so that a cycle back to them ends at once
+                self.parents[left] = right
+                stack.append((left_shape[0], right_shape[0]))
+                stack.append((left_shape[1], right_shape[1]))
+            elif left_shape != right_shape:
+                return False
+        return True
+
+    def copy(self, node: int) -> int:
+        """A copy of the type at `node` with fresh variables."""
+        copies = {}
+        stack = [self.find(node)]
+        while stack:
+            original = stack.pop()
+            if original in copies:
+                continue
+            shape = self.shapes[original]
+            if type(shape) is tuple:
+                domain, codomain = self.find(shape[0]), self.find(shape[1])
+                copies[original] = self.new()
+                stack.append(domain)
+                stack.append(codomain)
+            else:
+                copies[original] = self.new(shape)
+        for original, copied in copies.items():
+            shape = self.shapes[original]
+            if type(shape) is tuple:
+                self.shapes[copied] = copies[self.find(shape[0])], copies[self.find(shape[1])]
+        return copies[self.find(node)]
+
+    def acyclic(self) -> bool:
+        # 1: on the path of the walk, 2: done with
+        state = {}
+        for start in range(len(self.parents)):
+            if self.find(start) in state:
+                continue
+            stack = [(self.find(start), False)]
+            while stack:
+                node, done = stack.pop()
+                if done:
+                    state[node] = 2
+                    continue
+                seen = state.get(node)
+                if seen == 1:
+                    return False
+                if seen == 2:
+                    continue
+                state[node] = 1
+                stack.append((node, True))
+                shape = self.shapes[node]
+                if type(shape) is tuple:
+                    stack.append((self.find(shape[0]), False))
+                    stack.append((self.find(shape[1]), False))
+        return True
+
+    def show(self, node: int) -> str:
+        names = {}
+        out = []
+        stack = [(self.find(node), False)]
+        while stack:
+            item, parenthesized = stack.pop()
+            if type(item) is str:
+                out.append(item)
+                continue
+            shape = self.shapes[item]
+            if shape is None:
+                if item not in names:
+                    names[item] = get_nth_lex_string(len(names) + 1, string.ascii_lowercase)
+                out.append(names[item])
+            elif type(shape) is str:
+                out.append(shape)
+            else:
+                # arrows associate to the right
+                if parenthesized:
+                    stack.append((")", False))
+                stack.append((self.find(shape[1]), False))
+                stack.append((" -> ", False))
+                stack.append((self.find(shape[0]), True))
+                if parenthesized:
+                    stack.append(("(", False))
+        return "".join(out)
+
+
+def shared_closed(term: Term) -> set[int]:
+    """Ids of the closed subterms met more than once in the DAG of `term`."""
+    debruijn = hasattr(term, 'loose')
+    # id: free variables, and whether met again
+    free = {}
+    shared = set()
+    stack = [term]
+    while stack:
+        node = stack[-1]
+        if id(node) in free:
+            stack.pop()
+            continue
+        kind = kind_of(node)
+        if kind == APP:
+            func, arg = free.get(id(node.func)), free.get(id(node.arg))
+            if func is None or arg is None:
+                stack.append(node.func)
+                stack.append(node.arg)
+                continue
+            free[id(node)] = union(func, arg)
+        elif kind == ABS:
+            body = free.get(id(node.body))
+            if body is None:
+                stack.append(node.body)
+                continue
+            free[id(node)] = body if debruijn else without(body, name_of(node.param))
+        elif kind == VAR:
+            free[id(node)] = singleton(name_of(node.name))
+        else:
+            free[id(node)] = NO_FREE_VARS
+        stack.pop()
+
+    seen = set()
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            if not free[id(node)] and not (debruijn and node.loose):
+                shared.add(id(node))
+            continue
+        seen.add(id(node))
+        kind = kind_of(node)
+        if kind == APP:
+            stack.append(node.arg)
+            stack.append(node.func)
+        elif kind == ABS:
+            stack.append(node.body)
+    return shared
+
+
+def infer_node(term: Term, types: Types) -> Optional[int]:
+    """The node of the type of `term` in `types`, None when unification
+    fails; the graph may still have cycles."""
+    debruijn = hasattr(term, 'loose')
+    shared = shared_closed(term)
+    # id of a shared subterm: a copy of its type, taken before its context
+    # could narrow it
+    schemes = {}
+    # name: types of the enclosing binders of that name, innermost last; for
+    # de Bruijn terms, the types of all of them
+    scope: dict[str, list[int]] = {}
+    binders: list[int] = []
+    constants: dict[str, int] = {}
+    results: list[int] = []
+    # (node, done)
+    stack = [(term, False)]
+    while stack:
+        node, done = stack.pop()
+        kind = kind_of(node)
+        if done:
+            if kind == APP:
+                arg, func = results.pop(), results.pop()
+                result = types.new()
+                if not types.unify(func, types.new((arg, result))):
+                    return None
+            else:
+                body = results.pop()
+                param = binders.pop() if debruijn else scope[name_of(node.param)].pop()
+                result = types.new((param, body))
+            results.append(result)
+            if id(node) in shared:
+                schemes[id(node)] = types.copy(result)
+            continue
+        if id(node) in schemes:
+            results.append(types.copy(schemes[id(node)]))
+        elif kind == APP:
+            stack.append((node, True))
+            stack.append((node.arg, False))
+            stack.append((node.func, False))
+        elif kind == ABS:
+            if debruijn:
+                binders.append(types.new())
+            else:
+                scope.setdefault(name_of(node.param), []).append(types.new())
+            stack.append((node, True))
+            stack.append((node.body, False))
+        elif kind == VAR:
+            name = name_of(node.name)
+            bound = None if debruijn else scope.get(name)
+            if bound:
+                results.append(bound[-1])
+            else:
+                if name not in constants:
+                    constants[name] = types.new()
+                results.append(constants[name])
+        elif kind == IDX:
+            if node.index < len(binders):
+                results.append(binders[-1 - node.index])
+            else:
+                results.append(types.new())
+        else:
+            results.append(types.new(BOOL if type(node.value) is bool else INT))
+    return results[-1]
+
+
+def infer(term: Term) -> Optional[str]:
+    """The principal simple type of `term`, as text, or None when it has
+    none."""
+    types = Types()
+    node = infer_node(term, types)
+    if node is None or not types.acyclic():
+        return None
+    return types.show(node)
+
+
+def typeable(term: Term) -> bool:
+    """Whether `term` is simply typed, and so strongly normalizing."""
+    types = Types()
+    return infer_node(term, types) is not None and types.acyclic()
@@ -0,0 +1,231 @@
+import os
+import mmap
+import struct
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Optional, Union
+
+from src.lc.backends import BACKENDS, module
+from src.lc.serialize import dumps, loads
+from src.lc.calculi_lazy import Term as TermLazy
+from src.lc.calculi_machine import Term as TermMachine, Lit
+
+# Normal forms of let bodies, kept on disk across runs, one file per calculi.
+#
+# An entry is keyed by an alpha-invariant hash of the term it was normalized
+# from, together with the calculi and the step budget, so editing a
+# definition, or anything it refers to, simply misses. The file header holds
+# a format version and a fingerprint of the calculi's source; a file written
+# by another version of either is discarded on load, as is a truncated tail.
+# Entries are evicted least recently used first once the file outgrows
+# `max_bytes`, down to half of it; a term too large for that half is not
+# stored.
+#
+# The file is memory-mapped and only its record index is read on load; a
+# term is decoded the first time it is asked for. Records are appended
+# without mapping the file again, which is left to the first read past the
+# mapped part.
+#
+# file:    header, then records
+# header:  MAGIC, FORMAT_VERSION, fingerprint
+# record:  key, payload length, payload, a term as written by serialize.dumps
+
+MAGIC = b'LCNF'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sI16s')
+RECORD = struct.Struct('<16sI')
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+def digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def fingerprint(calculi: str) -> bytes:
+    # the source of the module that defines the calculi's terms and reduction
+    with open(module(calculi).__file__, 'rb') as file:
+        return digest(file.read())
+
+
+class NormalFormCache:
+    """Persistent, content-addressed table of normal forms."""
+
+    def __init__(self, directory: str, calculi: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = os.path.join(directory, f'{calculi}.nfc')
+        self.calculi = calculi
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint(calculi)
+        # key: (offset, length) of the payload, least recently used first
+        self.index = OrderedDict()
+        # key: term, for the entries decoded or written by this process
+        self.terms = {}
+        # id: (weak reference to the term, hash) of the closed subterms hashed
+        # so far and still alive; an entry goes with its term, so the memo
+        # keeps no term alive and a reused id never finds a stale hash
+        self.hashes = {}
+        self.data = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.fingerprint)
+        with open(self.path, 'ab+') as file:
+            file.seek(0)
+            if file.read(HEADER.size) != header:
+                # missing, or written by another format or calculi version
+                file.truncate(0)
+                file.write(header)
+        self.remap()
+
+        offset = HEADER.size
+        while offset + RECORD.size <= self.size:
+            key, length = RECORD.unpack_from(self.data, offset)
+            if offset + RECORD.size + length > self.size:
+                break
+            self.index[key] = (offset + RECORD.size, length)
+            self.index.move_to_end(key)
+            offset += RECORD.size + length
+        if offset != self.size:
+            # a record cut short, by a run that did not finish writing it
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+            self.remap()
+
+    def mapped(self) -> mmap.mmap:
+        if self.data is None or len(self.data) < self.size:
+            self.remap()
+        return self.data
+
+    def remap(self):
+        if self.data is not None:
+            self.data.close()
+        with open(self.path, 'rb') as file:
+            self.size = os.fstat(file.fileno()).st_size
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def key(self, term: Union[TermLazy, TermMachine], n_steps: int = -1) -> bytes:
+        return digest(b'%s:%d:%s' % (self.calculi.encode(), n_steps, self.hash(term)))
+
+    def hash(self, term: Union[TermLazy, TermMachine]) -> bytes:
+        # Merkle hash with bound variables as de Bruijn indices, so that the
+        # names of parameters do not matter. Each result comes with how many
+        # enclosing binders it depends on, a free name depending on all of
+        # them; only hashes that depend on none are memoized.
+        Var, App, _ = BACKENDS[self.calculi]
+        hashes = self.hashes
+        scope = []
+        results = []
+        stack = [(term, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                if type(node) is App:
+                    (arg, arg_depth), (func, func_depth) = results.pop(), results.pop()
+                    result, depth = digest(b'A' + func + arg), max(func_depth, arg_depth)
+                else:
+                    scope.pop()
+                    body, body_depth = results.pop()
+                    result, depth = digest(b'L' + body), max(body_depth - 1, 0)
+                if depth == 0:
+                    hashes[id(node)] = (weakref.ref(node, lambda _, key=id(node): hashes.pop(key, None)), result)
+                results.append((result, depth))
+                continue
+
+            memo = hashes.get(id(node))
+            if memo is not None and memo[0]() is node:
+                results.append((memo[1], 0))
+                continue
+            kind = type(node)
+            if kind is Var:
+                for i in range(len(scope) - 1, -1, -1):
+                    if scope[i] == node.name:
+                        results.append((digest(b'B%d' % (len(scope) - 1 - i)), len(scope) - i))
+                        break
+                else:
+                    results.append((digest(b'F' + node.name.encode()), len(scope) + 1))
+            elif kind is Lit:
+                results.append((digest(b'C' + repr(node.value).encode()), 0))
+            elif kind is App:
+                stack.append((node, True))
+                stack.append((node.arg, False))
+                stack.append((node.func, False))
+            else:
+                scope.append(node.param)
+                stack.append((node, True))
+                stack.append((node.body, False))
+        return results.pop()[0]
+
+    def get(self, key: bytes) -> Optional[Union[TermLazy, TermMachine]]:
+        term = self.terms.get(key)
+        if term is None and key in self.index:
+            offset, length = self.index[key]
+            term = loads(self.mapped()[offset:offset + length], self.calculi)
+            self.terms[key] = term
+        if term is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.index.move_to_end(key)
+        return term
+
+    def put(self, key: bytes, term: Union[TermLazy, TermMachine]):
+        payload = dumps(term)
+        if HEADER.size + RECORD.size + len(payload) > self.max_bytes // 2:
+            return
+        if self.size + RECORD.size + len(payload) > self.max_bytes:
+            self.shrink(self.max_bytes // 2 - RECORD.size - len(payload))
+        with open(self.path, 'ab') as file:
+            file.write(RECORD.pack(key, len(payload)) + payload)
+        self.index[key] = (self.size + RECORD.size, len(payload))
+        self.index.move_to_end(key)
+        self.terms[key] = term
+        self.size += RECORD.size + len(payload)
+
+    def shrink(self, max_bytes: int):
+        # rewrites the file with the most recently used entries that fit
+        data = self.mapped()
+        kept = []
+        size = HEADER.size
+        for key in reversed(self.index):
+            offset, length = self.index[key]
+            if size + RECORD.size + length > max_bytes:
+                break
+            kept.append((key, data[offset:offset + length]))
+            size += RECORD.size + length
+        self.evictions += len(self.index) - len(kept)
+
+        self.index.clear()
+        offset = HEADER.size
+        with open(self.path + '.tmp', 'wb') as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.fingerprint))
+            for key, payload in reversed(kept):
+                file.write(RECORD.pack(key, len(payload)) + payload)
+                self.index[key] = (offset + RECORD.size, len(payload))
+                offset += RECORD.size + len(payload)
+        os.replace(self.path + '.tmp', self.path)
+        self.terms = {key: term for key, term in self.terms.items() if key in self.index}
+        self.remap()
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.index),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
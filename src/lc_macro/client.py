@@ -0,0 +1,74 @@
+import sys
+import json
+import socket
+from itertools import count
+
+# A blocking client of src.lc_macro.server, sending one request at a time.
+# Run as a prompt with
+#     python -m src.lc_macro.client (--socket=/tmp/lc.sock | --port=8765) [--host=127.0.0.1]
+#         [--fuel=1000] [--timeout=1.5] [--max_size=10000]
+
+
+class Client:
+    def __init__(self, path: str = None, host: str = '127.0.0.1', port: int = None):
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile('rwb')
+        self.ids = count()
+
+    def request(self, request: dict) -> dict:
+        request['id'] = next(self.ids)
+        self.file.write(json.dumps(request).encode() + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+        return json.loads(line)
+
+    def evaluate(self, expr: str, fuel: int = None, timeout: float = None, max_size: int = None,
+                 max_bytes: int = None) -> dict:
+        """The response to `expr`: its normal form, steps, status and timings,
+        or an error."""
+        return self.request({'expr': expr, 'fuel': fuel, 'timeout': timeout, 'max_size': max_size,
+                             'max_bytes': max_bytes})
+
+    def stats(self) -> dict:
+        return self.request({'op': 'stats'})
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: x.lstrip('-').split('=', 1), sys.argv[1:]))
+    limits = {
+        'fuel': int(variables['fuel']) if 'fuel' in variables else None,
+        'timeout': float(variables['timeout']) if 'timeout' in variables else None,
+        'max_size': int(variables['max_size']) if 'max_size' in variables else None,
+    }
+
+    with Client(path=variables.get('socket'), host=variables.get('host', '127.0.0.1'),
+                port=int(variables['port']) if 'port' in variables else None) as client:
+        while True:
+            try:
+                program = input('> ')
+            except EOFError:
+                break
+            if not program.strip():
+                continue
+            response = client.evaluate(program, **limits)
+            if 'error' in response:
+                print(response['error'])
+                continue
+            print(response['result'])
+            print(f"{response['status']}, {response['steps']} steps, {response['time_ms']['total']:.2f} ms")
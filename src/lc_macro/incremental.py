@@ -0,0 +1,220 @@
+from __future__ import annotations
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Union
+
+from .cache import NormalFormCache, digest
+from .parser import LambdaLetParser, LET_REGEX
+from .preprocessors import NumberPreprocessor
+from .primitives import Let, Line, Program
+from src.lc.parser import SCANNER, MACRO
+from src.lc.pool import normalize_all
+from src.lc.evaluate import Evaluation, NORMAL, DEADLINE
+from src.lc.decode import numeral
+
+if TYPE_CHECKING:
+    from src.lc.backends import Term
+
+# Incremental evaluation of a .lc program, for editing one while it runs.
+#
+# Every statement, the text between two ';', gets a fingerprint: a digest of
+# its text, whitespace collapsed, and of the fingerprints of the definitions
+# the names in it are bound to at that point of the program. It changes
+# whenever the statement or anything it refers to, however indirectly, does,
+# and only then. A statement whose fingerprint the previous run already had
+# keeps what that run made of it, a definition its parsed and normalized
+# body, an expression its normal form; the others are parsed and normalized
+# again, linked to the kept terms like any definition. So an edit redoes the
+# definition it touches, those built on it and the expressions using them,
+# and nothing else.
+#
+# In watch mode the file is polled for saves and evaluated again on each,
+# printing the expressions whose results were redone. A timeout bounds each
+# expression on the workers with --jobs, and an Evaluation in this process
+# without. Run with
+#     python -m src.lc_macro.incremental --program=src/program.lc [--primitives] [--numbers=100]
+#         [--cache=normal_forms_tmp] [--jobs=4] [--timeout=10] [--interval=0.2]
+
+# the fingerprint of a name bound to no definition, like a native operator
+UNBOUND = bytes(16)
+
+
+@dataclass
+class Entry:
+    line: Line
+    # whether a definition is bound to its body as written, see LambdaLetParser
+    unreduced: bool
+    # the update that parsed or normalized it last
+    run: int
+    # an expression's normal form and steps, the error it failed with, or
+    # None when it timed out
+    normalized: Union[tuple, Exception, None] = None
+    evaluated: bool = False
+
+
+def used_names(text: str) -> list[str]:
+    """The names of definitions `text` mentions, in order, without repeats."""
+    return list(dict.fromkeys(match.group(MACRO) for match in SCANNER.finditer(text) if match.lastindex == MACRO))
+
+
+class IncrementalProgram:
+    """A .lc program evaluated again after each edit, redoing only the
+    statements the edit reaches."""
+
+    def __init__(self, primitives: bool = False, numbers: int = 100, cache: NormalFormCache = None,
+                 jobs: int = 1, timeout: float = None):
+        self.primitives = primitives
+        self.calculi = 'Machine' if primitives else 'Lazy'
+        self.preprocessors = [] if primitives else [NumberPreprocessor(rng=numbers)]
+        self.cache = cache
+        self.jobs = jobs
+        self.timeout = timeout
+
+        # fingerprint: what the last update made of the statement
+        self.entries: dict[bytes, Entry] = {}
+        self.program = Program()
+        self.runs = 0
+        # statements of the last update, and how many of them were redone
+        self.statements = 0
+        self.redone = 0
+
+    def update(self, text: str) -> list[Entry]:
+        """The expressions of `text`, in order, normalized. An error leaves
+        the state of the previous update as it was."""
+        run = self.runs + 1
+        parser = LambdaLetParser('', primitives=self.primitives, cache=self.cache)
+        # name: fingerprint of the definition bound to it so far
+        bound: dict[str, bytes] = {}
+        entries: dict[bytes, Entry] = {}
+        program = Program()
+        expressions = []
+        for statement in text.replace('\n', ' ').split(';'):
+            statement = ' '.join(statement.split())
+            let = LET_REGEX.match(statement)
+            names = used_names(let.group(2) if let else statement)
+            key = digest(statement.encode() + b''.join(bound.get(name, UNBOUND) for name in names))
+
+            entry = entries.get(key) or self.entries.get(key)
+            if entry is None:
+                for preprocessor in self.preprocessors:
+                    statement = preprocessor.perform(statement)
+                line = parser.parse_line(statement)
+                entry = Entry(line, let is not None and let.group(1) in parser.unreduced, run)
+            elif isinstance(entry.line.value, Let):
+                # bound as parsing it would have
+                parser.macros[entry.line.value.slug] = entry.line.value.body
+                if entry.unreduced:
+                    parser.unreduced.add(entry.line.value.slug)
+            entries[key] = entry
+            program.lines.append(entry.line)
+            if let:
+                bound[let.group(1)] = key
+            else:
+                expressions.append(entry)
+
+        pending = list({id(entry): entry for entry in expressions if not entry.evaluated}.values())
+        terms = [entry.line.value for entry in pending]
+        if self.jobs > 1:
+            results = normalize_all(terms, self.calculi, jobs=self.jobs, timeout=self.timeout)
+        else:
+            results = [self.normalize(term) for term in terms]
+        for entry, normalized in zip(pending, results):
+            entry.normalized = normalized
+            entry.evaluated = True
+            entry.run = run
+
+        self.entries = entries
+        self.program = program
+        self.runs = run
+        self.statements = len(program.lines)
+        self.redone = sum(entry.run == run for entry in entries.values())
+        return expressions
+
+    def normalize(self, term: Term) -> Union[tuple, Exception, None]:
+        """What normalize_all would make of `term`, computed here."""
+        try:
+            if self.timeout is None:
+                return term.normalize()
+            evaluation = Evaluation(term, timeout=self.timeout)
+            evaluation.run()
+        except Exception as err:
+            return err
+        if evaluation.status == NORMAL:
+            return evaluation.term, evaluation.steps
+        if evaluation.status == DEADLINE:
+            return None
+        return RuntimeError(f"Evaluation ended {evaluation.status} after {evaluation.steps} steps")
+
+
+def report(program: IncrementalProgram, expressions: list[Entry], time_sec: float):
+    for entry in expressions:
+        if entry.run != program.runs:
+            continue
+        print(repr(entry.line.value))
+        if entry.normalized is None:
+            print(f"Timed out after {program.timeout}s")
+            print("=======================")
+            continue
+        if isinstance(entry.normalized, Exception):
+            print(f"{type(entry.normalized).__name__}: {entry.normalized}")
+            print("=======================")
+            continue
+        result, steps = entry.normalized
+        print(f"Steps: {steps}")
+        # numerals, encoded or native, are shown as numbers
+        value = numeral(result)
+        print(result if value is None else value)
+        print("=======================")
+    print(f"Redid {program.redone} of {program.statements} statements in {time_sec * 1000:.1f} ms")
+    if program.cache is not None:
+        stats = program.cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+              f"{stats['size']} entries, {stats['evictions']} evicted")
+
+
+def watch(path: str, program: IncrementalProgram, interval: float = 0.2):
+    """Evaluates the program at `path` again each time the file is saved,
+    until interrupted."""
+    mtime = None
+    while True:
+        try:
+            current = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            # an editor may replace the file on save, leaving a moment without it
+            current = mtime
+        if current != mtime:
+            mtime = current
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+            start = time.perf_counter()
+            try:
+                expressions = program.update(text)
+            except (SyntaxError, ValueError, KeyError, RecursionError) as error:
+                # a mistake in the file, like an unknown name or a term too
+                # deep to normalize, is reported and the watch goes on
+                print(f"{type(error).__name__}: {error}")
+            else:
+                report(program, expressions, time.perf_counter() - start)
+            sys.stdout.flush()
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: (x.lstrip('-').split('=', 1) + [''])[:2], sys.argv[1:]))
+    primitives = 'primitives' in variables
+    cache = None
+    if 'cache' in variables:
+        cache = NormalFormCache(variables['cache'], 'Machine' if primitives else 'Lazy')
+
+    program = IncrementalProgram(primitives=primitives, numbers=int(variables.get('numbers', 100)), cache=cache,
+                                 jobs=int(variables.get('jobs', 1)),
+                                 timeout=float(variables['timeout']) if 'timeout' in variables else None)
+    try:
+        watch(variables['program'], program, interval=float(variables.get('interval', 0.2)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.close()
@@ -1,36 +1,39 @@
 import re
+from typing import Union
 
+from .cache import NormalFormCache
 from .preprocessors import Preprocessor
 from .primitives import Let, Line, Program
-from src.lc.parser import LambdaParser
-from src.common.tokenizer import Tokenizer
+from src.lc.parser import LambdaParser, MACROS_REGEX
+from src.lc.typecheck import typeable
+from src.lc.calculi_lazy import Term as TermLazy
+from src.lc.calculi_machine import Term as TermMachine, Var, Lit, PRIMITIVES, CONSTANTS
 
 
-MACRO_REGEX = r"[A-Z+\-*/\[\]&|~_<>=]+"
-LC_MACRO_REGEX = re.compile(rf"\s*(?:({MACRO_REGEX})|(:=)|([a-z_\\.() ]+)$)")
+LET_REGEX = re.compile(rf"\s*({MACROS_REGEX})\s*:=(.*)$", re.DOTALL)
 
 
 class LambdaLetParser:
-    def __init__(self, text: str, preprocessors: list[Preprocessor]=None):
+    def __init__(self, text: str, preprocessors: list[Preprocessor]=None, primitives: bool=False,
+                 cache: NormalFormCache=None):
         self.text = text
         for preprocessor in preprocessors or []:
             self.text = preprocessor.perform(self.text)
 
-        self.substitutions = {}
+        # opt-in native numbers and operators, evaluated by the Machine calculi;
+        # numerals must then be left in place, without a NumberPreprocessor
+        self.primitives = primitives
+        self.calculi = 'Machine' if primitives else 'Lazy'
+        # normal forms of definitions from earlier runs
+        if cache is not None and cache.calculi != self.calculi:
+            raise ValueError(f"The cache holds {cache.calculi} terms, not {self.calculi} ones")
+        self.cache = cache
 
-    def perform_substitution(self, line: str) -> str:
-        if len(self.substitutions) == 0:
-            return line
-        # Custom "word boundary" — negative lookbehind and lookahead
-        # Matches if NOT preceded/followed by allowed word characters.
-        pattern = r'(?<![A-Z+\-*/\[\]&|~_<>=])({})(?![A-Z+\-*/\[\]&|~_<>=])'.format(
-            "|".join(re.escape(k) for k in self.substitutions.keys())
-        )
-
-        def repl(match: re.Match):
-            return f"({self.substitutions[match.group(1)]})"
-
-        return re.sub(pattern, repl, line)
+        # the definitions met so far: every use of a name links to the same
+        # parsed term, so a definition is parsed once and shared by its uses
+        self.macros: dict[str, Union[TermLazy, TermMachine]] = {}
+        # names bound to their body as written rather than to its normal form
+        self.unreduced: set[str] = set()
 
     def parse(self) -> Program:
         lines = self.text.replace('\n', ' ').split(";")
@@ -40,25 +43,53 @@ class LambdaLetParser:
         return program
 
     def parse_line(self, line: str) -> Line:
-        line = self.perform_substitution(line)
-        tok = Tokenizer(line, token_regex=LC_MACRO_REGEX)
-        if re.match(MACRO_REGEX, tok.peek()):
-            return Line(self.parse_let(tok))
-        else:
-            parser = LambdaParser(line, calculi='Lazy')
-            return Line(parser.parse())
+        let = LET_REGEX.match(line)
+        if let:
+            return Line(self.parse_let(let.group(1), let.group(2)))
+        return Line(self.parser(line).parse())
+
+    def parser(self, text: str) -> LambdaParser:
+        return LambdaParser(text, calculi=self.calculi, primitives=self.primitives, macros=self.macros)
+
+    def parse_let(self, slug: str, body_str: str) -> Let:
+        if self.primitives:
+            if slug in CONSTANTS:
+                self.macros[slug] = Lit(CONSTANTS[slug])
+                return Let(slug, self.macros[slug])
+            if slug in PRIMITIVES:
+                # the native operator stands in for the encoded definition
+                self.macros[slug] = Var(slug)
+                return Let(slug, self.macros[slug])
 
-    def parse_let(self, tok: Tokenizer) -> Let:
-        slug = tok.next()
-        tok.next()
-        body_str = tok.next()
-        body = LambdaParser(body_str, calculi='Optimized').parse()
+        parser = self.parser(body_str)
+        body = parser.parse()
 
         # hack
-        if slug == 'Y' or ('Y' in self.substitutions.keys() and self.substitutions['Y'] in body_str):
-            self.substitutions[slug] = body_str
+        if slug == 'Y' or parser.used_macros & self.unreduced:
+            self.unreduced.add(slug)
+            self.macros[slug] = body
             return Let(slug, body)
         else:
-            reduced_body, _ = body.normalize(n_steps=1000)
-            self.substitutions[slug] = repr(reduced_body)
+            reduced_body = self.normalize(body, n_steps=1000)
+            self.macros[slug] = reduced_body
             return Let(slug, reduced_body)
+
+    def normalize(self, body: Union[TermLazy, TermMachine], n_steps: int) -> Union[TermLazy, TermMachine]:
+        # a simply typed body reaches its normal form, so it needs no step budget
+        if typeable(body):
+            n_steps = -1
+
+        if self.cache is not None:
+            key = self.cache.key(body, n_steps)
+            reduced_body = self.cache.get(key)
+            if reduced_body is not None:
+                return reduced_body
+
+        if self.primitives:
+            reduced_body, _ = body.normalize(n_steps=n_steps)
+        else:
+            reduced_body, _ = body.energetic_normalize(n_steps=n_steps)
+
+        if self.cache is not None:
+            self.cache.put(key, reduced_body)
+        return reduced_body
@@ -1,12 +1,9 @@
-import os
 import re
 import random
 import string
-import pandas as pd
-from src.lc.calculi_vanilla import Var, App, Abs
 from abc import ABC, abstractmethod
 
-PREPROCESSORS_DIR = 'preprocessors_tmp'
+NUMBER_REGEX = re.compile("[0-9]+")
 
 
 class Preprocessor(ABC):
@@ -17,22 +14,17 @@ class Preprocessor(ABC):
 
 class NumberPreprocessor(Preprocessor):
     def __init__(self, rng: int):
-        numbers_file_name = f'{PREPROCESSORS_DIR}/number_{rng}.csv'
-        if os.path.exists(numbers_file_name):
-            self.numbers_df = pd.read_csv(numbers_file_name)
-        else:
-            numbers = []
-            for i in range(rng):
-                numeral = self.generate_church_number(i)
-                numbers.append([i, numeral.print()])
-            self.numbers_df = pd.DataFrame(numbers, columns=['n', 'numeral'])
-            os.makedirs(PREPROCESSORS_DIR, exist_ok=True)
-            self.numbers_df.to_csv(numbers_file_name, index=False)
+        # numbers from 0 to rng - 1 are expanded; each numeral is built the
+        # first time it is met and then reused
+        self.rng = rng
+        self.numerals: dict[int, str] = {}
 
     def get_unique_var_name(self):
         return ''.join(random.choices(string.ascii_lowercase, k=10))
 
     def generate_church_number(self, n):
+        from src.lc.calculi_vanilla import Var, App, Abs
+
         # z = self.get_unique_var_name()
         # s = self.get_unique_var_name()
         z = 'z'
@@ -42,12 +34,17 @@ class NumberPreprocessor(Preprocessor):
             body = App(Var(s), body)
         return Abs(s, Abs(z, body))
 
+    def get_numeral(self, n: int) -> str:
+        numeral = self.numerals.get(n)
+        if numeral is None:
+            if n >= self.rng:
+                raise ValueError(f"Number {n} is out of the preprocessed range [0, {self.rng})")
+            # the printed form of generate_church_number(n), without building the term
+            numeral = "\\s. \\z. " + "s (" * (n - 1) + "s " * (n > 0) + "z" + ")" * (n - 1)
+            self.numerals[n] = numeral
+        return numeral
+
     def perform(self, text: str) -> str:
-        matches = [(m.group(), m.start(), m.end()) for m in re.finditer("[0-9]+", text)]
-        offset = 0
-        for match, start, end in matches:
-            intron = self.numbers_df[self.numbers_df['n'] == int(match)].iloc[0]['numeral']
-            text = text[:start + offset] + intron + text[end + offset:]
-            offset += len(intron) - len(match)
-        return text
+        # parenthesized, so that a numeral in argument position does not swallow the arguments after it
+        return NUMBER_REGEX.sub(lambda match: f"({self.get_numeral(int(match.group()))})", text)
 
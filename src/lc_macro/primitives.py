@@ -1,13 +1,16 @@
 from __future__ import annotations
-from typing import Union
-from src.lc.calculi_optimized import Term
+from typing import TYPE_CHECKING, Union
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    from src.lc.calculi_optimized import Term
+    from src.lc.calculi_machine import Term as TermMachine
+
 
 @dataclass(frozen=True)
 class Let:
     slug: str
-    body: Term
+    body: Union[Term, TermMachine]
 
     def print(self, pretty=False) -> str:
         if pretty:
@@ -17,7 +20,7 @@ class Let:
 
 
 class Line:
-    def __init__(self, value: Union[Let, Term]):
+    def __init__(self, value: Union[Let, Term, TermMachine]):
         self.value = value
 
     def print(self, pretty=False) -> str:
@@ -0,0 +1,243 @@
+import sys
+import json
+import time
+import asyncio
+from collections import Counter
+from multiprocessing.connection import Connection
+from typing import Optional
+
+from .cache import NormalFormCache
+from .parser import LambdaLetParser, LET_REGEX
+from .preprocessors import NumberPreprocessor
+from src.lc.evaluate import Evaluation, DEADLINE, LIMITS
+from src.lc.pool import Worker
+
+# A long-running evaluation server. The definitions of a prelude (.lc file)
+# are parsed and normalized once per worker process and stay in memory, so a
+# request only parses and normalizes its own expression, linked to them.
+#
+# Clients talk JSON lines over a Unix or TCP socket and may send several
+# requests before reading the responses, which come back as they complete,
+# tagged with the request's id:
+#     request:  {"id": 1, "expr": "+ 1 2", "fuel": 1000, "timeout": 1.5, "max_size": 10000}
+#               {"id": 2, "op": "stats"}
+#     response: {"id": 1, "result": "3", "steps": 1, "status": "normal",
+#                "time_ms": {"queue": .., "parse": .., "eval": .., "total": ..}}
+#               {"id": 1, "error": "..."}
+# Limits are those of src.lc.evaluate. A request may lower the server's own
+# limits, not raise them. A worker still busy GRACE_SEC after the deadline,
+# as Machine and NbE only check fuel, is killed and replaced.
+#
+# Run with
+#     python -m src.lc_macro.server --prelude=src/program.lc (--socket=/tmp/lc.sock | --port=8765)
+#         [--host=127.0.0.1] [--jobs=4] [--primitives] [--numbers=100] [--cache=normal_forms_tmp]
+#         [--fuel=100000] [--timeout=10] [--max_size=1000000] [--max_bytes=1073741824]
+
+GRACE_SEC = 1.0
+
+
+def prelude_parser(prelude: str, primitives: bool, numbers: int, cache_dir: Optional[str]) -> LambdaLetParser:
+    """A parser whose macros hold the definitions of `prelude`."""
+    calculi = 'Machine' if primitives else 'Lazy'
+    cache = None if cache_dir is None else NormalFormCache(cache_dir, calculi)
+    preprocessors = [] if primitives else [NumberPreprocessor(rng=numbers)]
+    parser = LambdaLetParser(prelude, preprocessors=preprocessors, primitives=primitives, cache=cache)
+    parser.parse()
+    if cache is not None:
+        cache.close()
+    return parser
+
+
+def work(conn: Connection, prelude: str, primitives: bool, numbers: int, cache_dir: Optional[str]):
+    parser = prelude_parser(prelude, primitives, numbers, cache_dir)
+    numerals = None if primitives else NumberPreprocessor(rng=numbers)
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        text, limits = task
+        start = time.perf_counter()
+        try:
+            if LET_REGEX.match(text):
+                raise SyntaxError("Definitions belong in the prelude")
+            if numerals is not None:
+                text = numerals.perform(text)
+            term = parser.parser(text).parse()
+            parsed = time.perf_counter()
+            evaluation = Evaluation(term, **limits)
+            evaluation.run()
+            response = {'result': str(evaluation.term), 'steps': evaluation.steps, 'status': evaluation.status}
+            response['time_ms'] = {'parse': (parsed - start) * 1000, 'eval': (time.perf_counter() - parsed) * 1000}
+        except Exception as err:
+            response = {'error': f"{type(err).__name__}: {err}"}
+        conn.send(response)
+
+
+class EvaluationServer:
+    def __init__(self, prelude: str, jobs: int = 1, primitives: bool = False, numbers: int = 100,
+                 cache_dir: str = None, limits: dict = None):
+        self.worker_args = (prelude, primitives, numbers, cache_dir)
+        self.jobs = jobs
+        self.limits = {name: value for name, value in (limits or {}).items() if value is not None}
+        # parsed here first, which reports errors in the prelude before serving
+        # and fills the cache the workers then read from
+        parser = prelude_parser(*self.worker_args)
+        self.definitions = len(parser.macros)
+        # how well the cache served the prelude, None without one
+        self.cache_stats = None if parser.cache is None else parser.cache.stats()
+        self.idle: Optional[asyncio.Queue] = None
+        self.workers: list[Worker] = []
+        self.statuses = Counter()
+        self.restarts = 0
+
+    def spawn(self) -> Worker:
+        worker = Worker(*self.worker_args, target=work)
+        self.workers.append(worker)
+        return worker
+
+    def replace(self, worker: Worker) -> Worker:
+        worker.stop()
+        self.workers.remove(worker)
+        self.restarts += 1
+        return self.spawn()
+
+    async def serve(self, path: str = None, host: str = '127.0.0.1', port: int = None):
+        self.idle = asyncio.Queue()
+        for _ in range(self.jobs):
+            self.idle.put_nowait(self.spawn())
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in self.workers:
+                worker.stop()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # requests of a connection run concurrently, answered as they complete
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def respond(self, line: bytes, writer: asyncio.StreamWriter):
+        # every request is answered, with an error if need be, so that a
+        # client waiting for its id never waits forever
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise TypeError(f"a request must be an object, not {type(request).__name__}")
+            response = await self.answer(request)
+        except (ValueError, TypeError) as err:
+            response = {'error': f"Invalid request: {err}"}
+        except Exception as err:
+            response = {'error': f"{type(err).__name__}: {err}"}
+        response['id'] = request.get('id') if isinstance(request, dict) else None
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+    async def answer(self, request: dict) -> dict:
+        if request.get('op') == 'stats':
+            return self.stats()
+        if not isinstance(request.get('expr'), str):
+            return {'error': "Invalid request: no expression"}
+        limits = self.limits_of(request)
+        received = time.perf_counter()
+        worker = await self.idle.get()
+        dispatched = time.perf_counter()
+        if not worker.process.is_alive():
+            # died while idle, which only its next task would notice
+            worker = self.replace(worker)
+        try:
+            worker.conn.send((request['expr'], limits))
+            timeout = limits.get('timeout')
+            if await self.readable(worker.conn, None if timeout is None else timeout + GRACE_SEC):
+                try:
+                    response = worker.conn.recv()
+                except EOFError:
+                    dead, worker = worker, self.replace(worker)
+                    response = {'error': f"ChildProcessError: Worker exited with code {dead.process.exitcode}"}
+            else:
+                worker = self.replace(worker)
+                response = {'status': DEADLINE}
+        except BaseException:
+            # a response may still be on its way, so the worker cannot be reused
+            worker = self.replace(worker)
+            raise
+        finally:
+            self.idle.put_nowait(worker)
+
+        self.statuses[response.get('status', 'error')] += 1
+        time_ms = response.setdefault('time_ms', {})
+        time_ms['queue'] = (dispatched - received) * 1000
+        time_ms['total'] = (time.perf_counter() - received) * 1000
+        return response
+
+    def limits_of(self, request: dict) -> dict:
+        limits = dict(self.limits)
+        for name in LIMITS:
+            value = request.get(name)
+            if value is not None:
+                # the timeout may be fractional, the other limits are counts
+                if type(value) not in ((int, float) if name == 'timeout' else (int,)):
+                    raise TypeError(f"{name} must be a number, not {type(value).__name__}")
+                limits[name] = value if name not in limits else min(value, limits[name])
+        return limits
+
+    @staticmethod
+    async def readable(conn: Connection, timeout: Optional[float]) -> bool:
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(conn.fileno(), lambda: ready.done() or ready.set_result(True))
+        try:
+            return await asyncio.wait_for(ready, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(conn.fileno())
+
+    def stats(self) -> dict:
+        return {
+            'jobs': self.jobs,
+            'definitions': self.definitions,
+            'cache': self.cache_stats,
+            'limits': self.limits,
+            'served': sum(self.statuses.values()),
+            'statuses': dict(self.statuses),
+            'restarts': self.restarts,
+            'idle': self.idle.qsize(),
+        }
+
+
+if __name__ == '__main__':
+    variables = dict(map(lambda x: (x.lstrip('-').split('=', 1) + [''])[:2], sys.argv[1:]))
+
+    with open(variables['prelude'], "r", encoding="utf-8") as prelude_file:
+        prelude = prelude_file.read()
+    limits = {
+        'fuel': int(variables['fuel']) if 'fuel' in variables else None,
+        'timeout': float(variables['timeout']) if 'timeout' in variables else None,
+        'max_size': int(variables['max_size']) if 'max_size' in variables else None,
+        'max_bytes': int(variables['max_bytes']) if 'max_bytes' in variables else None,
+    }
+    server = EvaluationServer(prelude, jobs=int(variables.get('jobs', 1)), primitives='primitives' in variables,
+                              numbers=int(variables.get('numbers', 100)), cache_dir=variables.get('cache'),
+                              limits=limits)
+    address = variables.get('socket') or f"{variables.get('host', '127.0.0.1')}:{variables['port']}"
+    print(f"Serving {server.definitions} definitions on {address} with {server.jobs} workers")
+    try:
+        asyncio.run(server.serve(path=variables.get('socket'), host=variables.get('host', '127.0.0.1'),
+                                 port=int(variables['port']) if 'port' in variables else None))
+    except KeyboardInterrupt:
+        pass
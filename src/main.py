@@ -1,52 +1,27 @@
-import re
 import cProfile
 
 from src.lc.calculi_optimized import Term
 from src.lc.calculi_lazy import Term as TermLazy
+from src.lc.calculi_machine import Term as TermMachine
 from lc_macro.parser import LambdaLetParser
 from src.lc_macro.preprocessors import NumberPreprocessor
+from src.lc_macro.cache import NormalFormCache
+from src.lc_macro.incremental import IncrementalProgram, watch
+from src.lc.pool import normalize_all
+from src.lc.decode import numeral
 
-
-def church_to_int(expr: str) -> int:
-    # Normalize expression (replace λ with backslash, remove extra spaces)
-    expr = expr.replace('λ', '\\').strip()
-
-    # Basic pattern: \s.\z.<body>
-    # It accepts any variable names, not necessarily 's' and 'z'
-    m = re.match(r"^\\([a-zA-Z_][a-zA-Z0-9_]*)\.\s*\\([a-zA-Z_][a-zA-Z0-9_]*)\.(.*)$", expr)
-    if not m:
-        raise ValueError("Invalid Church numeral structure")
-
-    s_var, z_var, body = m.groups()
-
-    # Strip outer parentheses and spaces
-    body = body.strip()
-
-    # Count how many times `s_var` is applied to `z_var`
-    # We expect something like: s (s (s z)) or s(s(s(s z)))
-    # Step-by-step parsing of nested applications
-    count = 0
-    while True:
-        # Remove outer parentheses around single expression
-        body = body.strip()
-        # If body == z_var -> stop
-        if body == z_var:
-            return count
-        # If it starts with s_var
-        if body.startswith(s_var):
-            count += 1
-            # remove leading s_var and optional space/parenthesis
-            body = body[len(s_var):].strip()
-            if body.startswith('(') and body.endswith(')'):
-                body = body[1:-1].strip()
-            continue
-        # Sometimes structure is s (s (...)) or s(s(...))
-        m = re.match(rf"^{s_var}\s*\((.*)\)$", body)
-        if m:
-            count += 1
-            body = m.group(1)
-            continue
-        raise ValueError(f"Unexpected structure after {count} applications: {body!r}")
+# evaluate numbers and arithmetic natively instead of on Church numerals
+PRIMITIVES = True
+CALCULI = 'Machine' if PRIMITIVES else 'Lazy'
+# with more than one job, expression lines are normalized on a process pool,
+# each within TIMEOUT seconds (None for no limit)
+JOBS = 1
+TIMEOUT = None
+# normal forms of the definitions are kept here between runs
+CACHE_DIR = 'normal_forms_tmp'
+# evaluate the program again on every save, redoing only what an edit reaches
+# (see src/lc_macro/incremental.py)
+WATCH = False
 
 
 # program = input()
@@ -57,26 +32,53 @@ def church_to_int(expr: str) -> int:
 # print("\n\n\n\n\n\n")
 
 
-with open("src/program.lc", "r", encoding="utf-8") as file:
-    program = file.read()
+if __name__ == '__main__':
+    with open("src/program.lc", "r", encoding="utf-8") as file:
+        program = file.read()
+
+    cache = NormalFormCache(CACHE_DIR, CALCULI)
+    if WATCH:
+        try:
+            watch("src/program.lc", IncrementalProgram(primitives=PRIMITIVES, cache=cache, jobs=JOBS, timeout=TIMEOUT))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cache.close()
+        raise SystemExit
 
-    lambda_let_parser = LambdaLetParser(program, preprocessors=[NumberPreprocessor(rng=100)])
+    if PRIMITIVES:
+        lambda_let_parser = LambdaLetParser(program, primitives=True, cache=cache)
+    else:
+        lambda_let_parser = LambdaLetParser(program, preprocessors=[NumberPreprocessor(rng=100)], cache=cache)
     parsed_program = lambda_let_parser.parse()
+    cache.close()
 
     # print(parsed_program.lines[-1].print(pretty=True))
     # print("=======================")
 
-    for line in parsed_program.lines:
-        if isinstance(line.value, TermLazy):
-            print(repr(line.value))
-            # result = cProfile.run('normalize(line.value, trace=True)')
-            result, _ = line.value.normalize()
-            print(f"Steps: {_}")
-            try:
-                print(church_to_int(str(result)))
-            except:
-                print(result)
+    expressions = [line.value for line in parsed_program.lines if isinstance(line.value, (TermLazy, TermMachine))]
+    if JOBS > 1:
+        results = normalize_all(expressions, CALCULI, jobs=JOBS, timeout=TIMEOUT)
+    else:
+        # result = cProfile.run('normalize(line.value, trace=True)')
+        results = [expression.normalize() for expression in expressions]
+
+    for expression, normalized in zip(expressions, results):
+        print(repr(expression))
+        if normalized is None:
+            print(f"Timed out after {TIMEOUT}s")
             print("=======================")
+            continue
+        if isinstance(normalized, Exception):
+            print(f"{type(normalized).__name__}: {normalized}")
+            print("=======================")
+            continue
+        result, _ = normalized
+        print(f"Steps: {_}")
+        # numerals, encoded or native, are shown as numbers
+        value = numeral(result)
+        print(result if value is None else value)
+        print("=======================")
 
 # \x. \y. \s. \z. x s (y s z)
 # + := \x. \y. \s. \z. x s (y s z);